@@ -0,0 +1,203 @@
+import os
+
+# Offscreen rendering needs EGL, so it is selected before OpenGL is imported
+os.environ.setdefault('PYOPENGL_PLATFORM', 'egl')
+os.environ.setdefault('EGL_PLATFORM', 'surfaceless')
+
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import List, Tuple
+
+import OpenGL.GL as gl
+import cv2
+import numpy as np
+
+from engine.drawinginstanced import INSTANCED_SHADER_CODE
+from engine.entityregistry import EntityRegistry
+from engine.gpuresources import GpuResources
+from engine.renderer import Renderer
+from engine.scene import Scene
+from main_ocean import draw_ocean
+from ocean.drawingbubble import DrawingBubbles
+from ocean.drawingfish import DrawingFish, FISH_SHADER_CODE
+from ocean.fishschool import FishSchool
+
+
+def create_scene(
+        fish_count: int,
+        schooling: bool = False,
+        shared_texture: bool = False,
+) -> Tuple[Scene, DrawingBubbles]:
+    """
+    Build the ocean scene with synthetic fish
+    :param fish_count: Amount of fish
+    :param schooling: Fish swim in schools
+    :param shared_texture: All the fish use one texture. Otherwise every fish has its own texture like a scanned one
+    :return: Scene and sprite of its bubbles
+    """
+    entities = EntityRegistry(Scene())
+    draw_ocean(entities)
+
+    bubbles = DrawingBubbles(Renderer.create_texture_from_file('ocean/images/bubble.png'),
+                             Renderer.create_shader(gl.GL_VERTEX_SHADER, INSTANCED_SHADER_CODE))
+    entities.add(bubbles, 'bubbles')
+    school = FishSchool(bubbles)
+    school.schooling = schooling
+    entities.scene.add_system(school.animation)
+
+    fish_shader_program = Renderer.create_shader(gl.GL_VERTEX_SHADER, FISH_SHADER_CODE)
+    image = cv2.imread('ocean/images/fish.png', cv2.IMREAD_UNCHANGED)
+    image = cv2.cvtColor(image, cv2.COLOR_RGBA2BGRA)
+    shared_texid = Renderer.create_texture(image) if shared_texture else None
+    for _ in range(fish_count):
+        texid = shared_texid if shared_texture else Renderer.create_texture(image)
+        entities.add(DrawingFish(texid, school, shader=fish_shader_program), 'fish')
+    return entities.scene, bubbles
+
+
+def add_bubbles(
+        bubbles: DrawingBubbles,
+        count: int,
+) -> None:
+    """
+    Add bubbles at random places until there are enough of them
+    :param bubbles: Sprite of bubbles
+    :param count: Amount of bubbles to keep
+    :return:
+    """
+    missing = max(count - len(bubbles), 0)
+    bubbles.emit(np.random.uniform(-1.5, 1.5, missing), np.random.uniform(-0.9, 1.0, missing))
+
+
+def summarize(values: List[float]) -> dict:
+    """
+    Compute statistics of timings
+    :param values: Timings in milliseconds
+    :return: Dictionary with statistics
+    """
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'mean_ms': round(float(np.mean(values)), 3),
+        'max_ms': round(float(np.max(values)), 3),
+    }
+
+
+def run_case(
+        renderer: Renderer,
+        fish_count: int,
+        bubbles_count: int,
+        frames: int,
+        warmup: int,
+        schooling: bool = False,
+        shared_texture: bool = False,
+) -> dict:
+    """
+    Measure animation and rendering of the scene
+    :param renderer: Renderer with offscreen context
+    :param fish_count: Amount of fish
+    :param bubbles_count: Amount of bubbles
+    :param frames: Amount of measured frames
+    :param warmup: Amount of frames before measuring
+    :param schooling: Fish swim in schools
+    :param shared_texture: All the fish use one texture
+    :return: Dictionary with results
+    """
+    scene, bubbles = create_scene(fish_count, schooling, shared_texture)
+    add_bubbles(bubbles, bubbles_count)
+
+    animate_times, render_times, frame_times = [], [], []
+    frame_stats = []
+    for frame in range(warmup + frames):
+        start = time.perf_counter()
+        renderer.animate(scene)
+        add_bubbles(bubbles, bubbles_count)
+        animated = time.perf_counter()
+        renderer.render(scene)
+        # Wait for the driver, otherwise only queueing of the commands is measured
+        gl.glFinish()
+        rendered = time.perf_counter()
+
+        if frame >= warmup:
+            animate_times.append((animated - start) * 1000)
+            render_times.append((rendered - animated) * 1000)
+            frame_times.append((rendered - start) * 1000)
+            frame_stats.append(renderer.frame_stats)
+
+    results = {
+        'fish': fish_count,
+        'bubbles': bubbles_count,
+        'schooling': schooling,
+        'shared_texture': shared_texture,
+        'sprites': len(scene),
+        'animate': summarize(animate_times),
+        'render': summarize(render_times),
+        'frame': summarize(frame_times),
+        'frames_per_second': round(1000 / float(np.mean(frame_times)), 2),
+        # Counters are the same for every frame of the static scene, but fish and bubbles move
+        'per_frame': {key: round(float(np.mean([stats[key] for stats in frame_stats])), 2)
+                      for key in frame_stats[0]},
+        'gpu_resources': GpuResources.stats(),
+    }
+
+    for drawing in scene:
+        drawing.release()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the renderer without a window')
+    parser.add_argument('--frames', type=int, default=300, help='Amount of measured frames per case')
+    parser.add_argument('--warmup', type=int, default=30, help='Amount of frames before measuring')
+    parser.add_argument('--fish', type=int, nargs='+', default=[10, 50, 200], help='Amounts of fish to measure')
+    parser.add_argument('--bubbles', type=int, nargs='+', default=[50, 1000], help='Amounts of bubbles to measure')
+    parser.add_argument('--schooling', action='store_true', help='Fish swim in schools')
+    parser.add_argument('--shared-texture', action='store_true',
+                        help='All the fish use one texture to measure thousands of fish without running out of memory')
+    parser.add_argument('--width', type=int, default=1920, help='Width of the frame')
+    parser.add_argument('--height', type=int, default=1080, help='Height of the frame')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random positions of fish and bubbles')
+    parser.add_argument('--screenshot', type=str, default=None, help='Path to save the last frame')
+    parser.add_argument('--output', type=str, default=None, help='Path to save JSON report. Default is stdout')
+    args = parser.parse_args()
+
+    np.random.seed(args.seed)
+    renderer = Renderer(offscreen_size=(args.width, args.height))
+    gl.glClearColor(0.1, 0.1, 0.2, 1.0)
+
+    cases = []
+    for fish_count in args.fish:
+        for bubbles_count in args.bubbles:
+            case = run_case(renderer, fish_count, bubbles_count, args.frames, args.warmup,
+                            args.schooling, args.shared_texture)
+            cases.append(case)
+            print(f'fish={fish_count} bubbles={bubbles_count}: {case["frame"]["p50_ms"]} ms', file=sys.stderr)
+
+    if args.screenshot is not None:
+        cv2.imwrite(args.screenshot, cv2.cvtColor(renderer.offscreen.read_pixels(), cv2.COLOR_RGBA2BGRA))
+
+    report = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'gl_vendor': gl.glGetString(gl.GL_VENDOR).decode(),
+        'gl_renderer': gl.glGetString(gl.GL_RENDERER).decode(),
+        'gl_version': gl.glGetString(gl.GL_VERSION).decode(),
+        'resolution': [args.width, args.height],
+        'frames': args.frames,
+        'cases': cases,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, 'w') as file:
+            file.write(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+import argparse
+import contextlib
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from engine.simplescanner import SimpleScanner
+from main_ocean import scan_from_frame
+
+try:
+    import resource
+except ImportError:
+    # Module exists only on Unix
+    resource = None
+
+# Sizes of the test frames (width, height)
+RESOLUTIONS = [(1280, 960), (1920, 1080), (3840, 2160), (4000, 3000)]
+# Maximum shift of the sheet corners as a part of the sheet size
+DISTORTIONS = [0.0, 0.08]
+# Sigma of the gaussian blur
+BLURS = [0.0, 1.5]
+# Sigma of the gaussian noise
+NOISES = [0.0, 8.0]
+
+
+def create_sheet(
+        width: int = 1600,
+        height: int = 1200,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Draw a sheet with markers in the corners and a fish in the middle
+    :param width: Width of the sheet between outer corners of markers in pixels
+    :param height: Height of the sheet between outer corners of markers in pixels
+    :return: BGR image of the sheet with a white margin and coordinates of the sheet corners on it
+    """
+    aruco_dict = cv2.aruco.Dictionary_get(cv2.aruco.DICT_4X4_50)
+    margin = width // 20
+    marker_size = width // 6
+    sheet = np.full((height + 2 * margin, width + 2 * margin, 3), 255, np.uint8)
+
+    # Markers in the order: top left, top right, bottom right, bottom left
+    positions = [(margin, margin),
+                 (margin + width - marker_size, margin),
+                 (margin + width - marker_size, margin + height - marker_size),
+                 (margin, margin + height - marker_size)]
+    for marker_id, (x, y) in zip([3, 1, 2, 4], positions):
+        marker = cv2.aruco.drawMarker(aruco_dict, marker_id, marker_size)
+        sheet[y:y + marker_size, x:x + marker_size] = marker[..., None]
+
+    # Fish with an outline
+    center = (margin + width // 2, margin + height // 2)
+    axes = (width // 4, height // 6)
+    tail = np.array([[center[0] + axes[0] - 20, center[1]],
+                     [center[0] + axes[0] + width // 8, center[1] - height // 8],
+                     [center[0] + axes[0] + width // 8, center[1] + height // 8]], np.int32)
+    cv2.fillPoly(sheet, [tail], (40, 120, 230))
+    cv2.polylines(sheet, [tail], True, (20, 20, 20), 6)
+    cv2.ellipse(sheet, center, axes, 0, 0, 360, (60, 180, 250), -1)
+    cv2.ellipse(sheet, center, axes, 0, 0, 360, (20, 20, 20), 6)
+    cv2.circle(sheet, (center[0] - axes[0] // 2, center[1] - axes[1] // 3), height // 40, (20, 20, 20), -1)
+
+    corners = np.array([[margin, margin],
+                        [margin + width, margin],
+                        [margin + width, margin + height],
+                        [margin, margin + height]], np.float32)
+    return sheet, corners
+
+
+def create_frame(
+        sheet: np.ndarray,
+        resolution: Tuple[int, int],
+        distortion: float,
+        blur: float,
+        noise: float,
+        rng: np.random.Generator,
+) -> np.ndarray:
+    """
+    Put the sheet on a gray table in front of the camera
+    :param sheet: BGR image of the sheet
+    :param resolution: Size of the frame (width, height)
+    :param distortion: Maximum shift of the sheet corners as a part of the sheet size
+    :param blur: Sigma of the gaussian blur
+    :param noise: Sigma of the gaussian noise
+    :param rng: Random generator
+    :return: BGR frame
+    """
+    width, height = resolution
+    sheet_h, sheet_w = sheet.shape[:2]
+    # The sheet takes about 70% of the frame
+    scale = 0.7 * min(width / sheet_w, height / sheet_h)
+    w, h = sheet_w * scale, sheet_h * scale
+    x, y = (width - w) / 2, (height - h) / 2
+    target = np.array([[x, y], [x + w, y], [x + w, y + h], [x, y + h]], np.float32)
+    target += rng.uniform(-distortion, distortion, (4, 2)).astype(np.float32) * (w, h)
+
+    source = np.array([[0, 0], [sheet_w, 0], [sheet_w, sheet_h], [0, sheet_h]], np.float32)
+    M = cv2.getPerspectiveTransform(source, target)
+    frame = cv2.warpPerspective(sheet, M, (width, height), borderValue=(90, 100, 110))
+
+    if blur > 0:
+        frame = cv2.GaussianBlur(frame, (0, 0), blur)
+    if noise > 0:
+        frame = np.clip(frame + rng.normal(0, noise, frame.shape), 0, 255).astype(np.uint8)
+    return frame
+
+
+def measure(
+        function: Callable,
+        repeat: int,
+        warmup: int,
+) -> Tuple[List[float], int]:
+    """
+    Measure latency of the function
+    :param function: Function without arguments to measure
+    :param repeat: Amount of measured calls
+    :param warmup: Amount of calls before measuring
+    :return: Latencies in milliseconds and amount of failed calls
+    """
+    for _ in range(warmup):
+        try:
+            function()
+        except ValueError:
+            pass
+
+    latencies = []
+    failures = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            result = function()
+        except ValueError:
+            result = None
+        latencies.append((time.perf_counter() - start) * 1000)
+        if result is None or len(result) == 0:
+            failures += 1
+    return latencies, failures
+
+
+def summarize(
+        latencies: List[float],
+        failures: int,
+) -> dict:
+    """
+    Compute statistics of latencies
+    :param latencies: Latencies in milliseconds
+    :param failures: Amount of failed calls
+    :return: Dictionary with statistics
+    """
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'mean_ms': round(float(np.mean(latencies)), 3),
+        'per_second': round(1000 / float(np.mean(latencies)), 2),
+        'failures': failures,
+    }
+
+
+def peak_memory(function: Callable) -> int:
+    """
+    Measure peak memory allocated by one call of the function
+    :param function: Function without arguments to measure
+    :return: Peak of allocated memory in bytes
+    """
+    tracemalloc.start()
+    try:
+        function()
+    except ValueError:
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def max_rss_bytes() -> Optional[int]:
+    """
+    Get peak resident memory of the process
+    :return: Peak memory in bytes or None if the platform doesn't report it in known units
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes and macOS reports bytes
+    if sys.platform.startswith('linux'):
+        return max_rss * 1024
+    if sys.platform == 'darwin':
+        return max_rss
+    return None
+
+
+def run_case(
+        scanner: SimpleScanner,
+        frame: np.ndarray,
+        repeat: int,
+        warmup: int,
+) -> dict:
+    """
+    Measure all the scanning stages on one frame
+    :param scanner: Scanner to measure
+    :param frame: BGR frame with a sheet
+    :param repeat: Amount of measured calls
+    :param warmup: Amount of calls before measuring
+    :return: Dictionary with results
+    """
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    try:
+        warped = scanner.scan(rgb_frame)
+    except ValueError:
+        warped = None
+
+    results = {
+        'scan': summarize(*measure(lambda: scanner.scan(rgb_frame), repeat, warmup)),
+        'scan_cutout': summarize(*measure(lambda: scanner.scan_cutout(rgb_frame), repeat, warmup)),
+        'scan_from_frame': summarize(*measure(lambda: scan_from_frame(frame, scanner), repeat, warmup)),
+        'peak_memory_bytes': peak_memory(lambda: scan_from_frame(frame, scanner)),
+    }
+    if warped is not None:
+        results['remove_background'] = summarize(*measure(lambda: scanner.remove_background(warped),
+                                                           repeat, warmup))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the scanner on synthetic sheets')
+    parser.add_argument('--repeat', type=int, default=20, help='Amount of measured calls per case')
+    parser.add_argument('--warmup', type=int, default=2, help='Amount of calls before measuring')
+    parser.add_argument('--pyramid-level', type=int, default=None, help='Override pyramid level of the scanner')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random distortions and noise')
+    parser.add_argument('--output', type=str, default=None, help='Path to save JSON report. Default is stdout')
+    args = parser.parse_args()
+
+    scanner = SimpleScanner()
+    if args.pyramid_level is not None:
+        scanner.pyramid_level = args.pyramid_level
+    rng = np.random.default_rng(args.seed)
+    sheet, _ = create_sheet()
+
+    cases = []
+    for resolution in RESOLUTIONS:
+        for distortion in DISTORTIONS:
+            for blur in BLURS:
+                for noise in NOISES:
+                    frame = create_frame(sheet, resolution, distortion, blur, noise, rng)
+                    case = {
+                        'resolution': list(resolution),
+                        'distortion': distortion,
+                        'blur': blur,
+                        'noise': noise,
+                    }
+                    # Scanner reports missed markers to stdout, keep it clean for the report
+                    with contextlib.redirect_stdout(sys.stderr):
+                        case.update(run_case(scanner, frame, args.repeat, args.warmup))
+                    cases.append(case)
+                    print(f'{resolution} distortion={distortion} blur={blur} noise={noise}: '
+                          f'{case["scan_from_frame"]["p50_ms"]} ms', file=sys.stderr)
+
+    report = {
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'settings': scanner.settings(),
+        'repeat': args.repeat,
+        'cases': cases,
+        'max_rss_bytes': max_rss_bytes(),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, 'w') as file:
+            file.write(text)
+
+
+if __name__ == '__main__':
+    main()
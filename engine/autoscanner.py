@@ -0,0 +1,169 @@
+from threading import Thread
+from typing import Callable, List
+
+import cv2
+import numpy as np
+
+from engine.camera import CameraCapture
+from engine.simplescanner import Cutout
+
+
+class AutoScanner:
+    """
+    Watch the camera stream and scan a sheet when it stays still under the camera
+    """
+
+    def __init__(
+            self,
+            camera: CameraCapture,
+            scan: Callable[[np.ndarray], List[Cutout]],
+            on_scanned: Callable[[Cutout], None],
+    ):
+        """
+        Setup settings of the trigger
+        :param camera: Running camera capture
+        :param scan: Function to scan all the fish from a BGR frame
+        :param on_scanned: Function to receive scanned fish
+        """
+        self._camera = camera
+        self._scan = scan
+        self._on_scanned = on_scanned
+        self._thread = None
+        self._running = False
+
+        # Scanning can be paused without stopping the thread
+        self.enabled = True
+
+        # Width of the small grayscale copy of a frame to detect movement and sharpness
+        self.preview_width = 320
+        # Mean difference of preview pixels between frames which is considered as movement
+        self.motion_threshold = 3.0
+        # Amount of still frames before scanning
+        self.stable_frames = 15
+        # Mean difference of preview pixels from the last scanned scene to scan it again
+        self.change_threshold = 10.0
+        # Mean difference of fish thumbnails to consider them as the same sheet
+        self.duplicate_threshold = 12.0
+
+        # Last scanned scene and its fish to skip scanning the same sheet again
+        self._scanned_preview = None
+        self._scanned_thumbnails = []
+        self._reset_motion()
+
+    def _reset_motion(self) -> None:
+        """
+        Forget movement and sharpness of the previous frames. Scanned sheets are still remembered
+        :return:
+        """
+        self._previous_preview = None
+        self._still_count = 0
+        self._best_frame = None
+        self._best_sharpness = -1.0
+
+    def start(self) -> None:
+        """
+        Start watching the camera stream in the background thread
+        :return:
+        """
+        if self._running:
+            return
+        self._running = True
+        self._thread = Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop watching the camera stream
+        :return:
+        """
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self) -> None:
+        """
+        Process new frames from the camera while watching is running
+        :return:
+        """
+        frame_index = 0
+        while self._running:
+            try:
+                frame, frame_index = self._camera.wait_frame(frame_index, timeout=1.0)
+            except IOError:
+                if not self._camera.is_running:
+                    break
+                continue
+
+            if not self.enabled:
+                self._reset_motion()
+                continue
+            self.process_frame(frame)
+
+    def process_frame(
+            self,
+            frame: np.ndarray,
+    ) -> None:
+        """
+        Pass the frame through the cheap movement and sharpness checks and scan it when the sheet is still
+        :param frame: BGR frame from the camera
+        :return:
+        """
+        height, width = frame.shape[:2]
+        preview_height = max(int(height * self.preview_width / width), 1)
+        preview = cv2.resize(frame, (self.preview_width, preview_height), interpolation=cv2.INTER_AREA)
+        preview = cv2.cvtColor(preview, cv2.COLOR_BGR2GRAY)
+
+        previous_preview = self._previous_preview
+        self._previous_preview = preview
+        if previous_preview is None or self._difference(preview, previous_preview) > self.motion_threshold:
+            # Something moves under the camera, wait until it stops
+            self._still_count = 0
+            self._best_frame = None
+            self._best_sharpness = -1.0
+            return
+
+        # Select the sharpest frame while the scene is still
+        self._still_count += 1
+        _, deviation = cv2.meanStdDev(cv2.Laplacian(preview, cv2.CV_16S))
+        sharpness = float(deviation[0, 0]) ** 2
+        if sharpness > self._best_sharpness:
+            self._best_frame = frame
+            self._best_sharpness = sharpness
+
+        if self._still_count != self.stable_frames:
+            return
+
+        # Don't scan the same scene twice while it stays under the camera
+        if self._scanned_preview is not None and \
+                self._difference(preview, self._scanned_preview) < self.change_threshold:
+            return
+        self._scanned_preview = preview
+
+        scanned_fish_list = self._scan(self._best_frame)
+        self._best_frame = None
+
+        # Sheets could be moved a little without changing, so compare the scanned fish too
+        thumbnails = []
+        for scanned_fish in scanned_fish_list:
+            thumbnail = cv2.resize(scanned_fish.image[..., :3], (32, 24), interpolation=cv2.INTER_AREA)
+            thumbnails.append(thumbnail)
+            if any(self._difference(thumbnail, scanned_thumbnail) < self.duplicate_threshold
+                   for scanned_thumbnail in self._scanned_thumbnails):
+                continue
+            self._on_scanned(scanned_fish)
+        if len(thumbnails) > 0:
+            self._scanned_thumbnails = thumbnails
+
+    @staticmethod
+    def _difference(
+            image_a: np.ndarray,
+            image_b: np.ndarray,
+    ) -> float:
+        """
+        Compute mean absolute difference of two images
+        :param image_a: First image
+        :param image_b: Second image of the same size
+        :return: Mean difference of pixels
+        """
+        return cv2.norm(image_a, image_b, cv2.NORM_L1) / image_a.size
@@ -0,0 +1,118 @@
+from threading import Condition, Thread
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class CameraCapture:
+    """
+    Keep the camera open and capture frames in the background thread
+    """
+
+    def __init__(
+            self,
+            camera_id: int = 0,
+    ):
+        """
+        Setup capture settings
+        :param camera_id: Id of the camera to capture frames
+        """
+        self._camera_id = camera_id
+        self._camera = None
+        self._thread = None
+        self._running = False
+
+        # Single slot with the latest frame. Old frames are dropped without processing
+        self._condition = Condition()
+        self._frame = None
+        self._frame_index = 0
+
+    @property
+    def is_running(self) -> bool:
+        """
+        Check if frames are being captured
+        :return: True if the camera is capturing
+        """
+        return self._running
+
+    def start(self) -> None:
+        """
+        Open the camera and start capturing frames
+        :return:
+        """
+        if self._running:
+            return
+        self._camera = cv2.VideoCapture(self._camera_id)
+        if not self._camera.isOpened():
+            raise EnvironmentError('Can not connect to the camera')
+        # Keep as few frames as possible in the driver, so the latest frame is really fresh
+        self._camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self._running = True
+        self._thread = Thread(target=self._capture, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop capturing and release the camera
+        :return:
+        """
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._condition:
+            self._condition.notify_all()
+
+    def _capture(self) -> None:
+        """
+        Read frames from the camera while capturing is running
+        :return:
+        """
+        try:
+            while self._running:
+                ret, frame = self._camera.read()
+                if ret is False:
+                    print('Error reading frame from the camera')
+                    break
+                # Camera allocates a new array for every frame, so consumers can keep the old one
+                with self._condition:
+                    self._frame = frame
+                    self._frame_index += 1
+                    self._condition.notify_all()
+        finally:
+            self._running = False
+            self._camera.release()
+            with self._condition:
+                self._condition.notify_all()
+
+    def get_frame(
+            self,
+            timeout: Optional[float] = 5.0,
+    ) -> np.ndarray:
+        """
+        Get the latest captured frame
+        :param timeout: Time in seconds to wait for the first frame
+        :return: BGR frame from the camera
+        """
+        frame, _ = self.wait_frame(0, timeout)
+        return frame
+
+    def wait_frame(
+            self,
+            last_index: int,
+            timeout: Optional[float] = 5.0,
+    ) -> Tuple[np.ndarray, int]:
+        """
+        Wait for a frame newer than the already processed one
+        :param last_index: Index of the last processed frame
+        :param timeout: Time in seconds to wait for the new frame
+        :return: BGR frame from the camera and its index
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._frame_index > last_index or not self._running,
+                                            timeout):
+                raise IOError('Error reading frame from the camera')
+            if self._frame_index <= last_index:
+                raise IOError('Camera is stopped')
+            return self._frame, self._frame_index
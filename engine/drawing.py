@@ -3,15 +3,37 @@ from __future__ import annotations
 from typing import List
 
 import OpenGL.GL as gl
-import OpenGL.arrays.vbo as glvbo
 import numpy as np
 
+from engine.glstate import GlState
+from engine.gpuresources import GpuResources
+from engine.mesh import Mesh
+
+# Attribute locations of the model matrix (4 columns) and the sprite color with the animation timer.
+# They don't overlap with locations of gl_Vertex and gl_MultiTexCoord0 on drivers which alias them
+MODEL_LOCATION = 4
+SPRITE_LOCATION = 9
+
+# Shader for sprites without own shader
+SPRITE_SHADER_CODE = """
+attribute mat4 model;
+attribute vec4 sprite;
+void main() {
+    gl_Position = gl_ModelViewProjectionMatrix * model * gl_Vertex;
+    gl_FrontColor = vec4(sprite.rgb, 1.0);
+    gl_TexCoord[0] = gl_MultiTexCoord0;
+}
+"""
+
 
 class Drawing:
     """
     Draw and animate 3D sprite
     """
 
+    # Sprite is drawn by SpriteBatch together with other sprites. Set False if render() is overridden
+    batched = True
+
     def __init__(
             self,
             texid: int,
@@ -20,14 +42,15 @@ class Drawing:
             shader: int = 0,
     ):
         """
-        Setup default position for sprite. Initialize mesh of selected size.
+        Setup default position for sprite. Take shared mesh of selected size.
         :param texid: ID of texture
         :param grid_x: Mesh elements along axis X
         :param grid_y: Mesh elements along axis Y
         :param shader: ID of shader. Select 0 if you need no shader
         """
 
-        # Setup default positions of sprite
+        # Setup default positions of sprite. Z sets the order of drawing, so Scene.update() should be called
+        # after changing it for a sprite of a scene
         self.position = np.array([0, 0., 0.])
         self.rotate = np.array([0., 0., 0.])
         self.scale = np.array([1.0, 1.0, 1.0])
@@ -41,70 +64,119 @@ class Drawing:
         self.vector = np.array([0.0, 0.0, 0.0])
         self.rotation_vector = np.array([0.0, 0.0, 0.0])
 
+        # Position, rotation and scale before the last step of animation to interpolate them while rendering
+        self.previous_state = None
+
         self._texid = texid
         self._shader = shader
         self._time_counter = 0.0
+        self._released = False
+        GpuResources.retain('texture', texid)
 
-        # Create vertices array for the sprite
-        vertices = self._mesh_create(grid_size_x=grid_x, grid_size_y=grid_y)
-        self._vertices_count = len(vertices)
-        self._vbo_vertices = glvbo.VBO(np.array(vertices, 'f'))
-        self._vbo_texcoords = glvbo.VBO(np.array(vertices, 'f') + 0.5)
-
-        self._vao = gl.glGenVertexArrays(1)
-        gl.glBindVertexArray(self._vao)
+        # Sprites with the same grid share one mesh on the GPU
+        self._mesh = Mesh.get(grid_x, grid_y)
+        self._vao = self._mesh.vao
 
-        gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
-        gl.glEnableClientState(gl.GL_TEXTURE_COORD_ARRAY)
+    @property
+    def texid(self) -> int:
+        """
+        :return: ID of texture
+        """
+        return self._texid
 
-        self._vbo_vertices.bind()
-        gl.glVertexPointer(3, gl.GL_FLOAT, 0, None)
-        self._vbo_texcoords.bind()
-        gl.glTexCoordPointer(3, gl.GL_FLOAT, 0, None)
+    @property
+    def shader(self) -> int:
+        """
+        :return: ID of shader or 0 if the sprite has no shader
+        """
+        return self._shader
 
-        gl.glBindVertexArray(0)
+    @property
+    def mesh(self) -> Mesh:
+        """
+        :return: Shared mesh of the sprite
+        """
+        return self._mesh
 
-    def _apply_transforms(self) -> None:
+    def _apply_transforms(
+            self,
+            alpha: float = 1.0,
+    ) -> None:
         """
         Apply translation, rotation and scaling to the sprite
+        :param alpha: Part of the time between the previous and the last step of animation to draw the sprite at
         :return:
         """
-        gl.glTranslatef(*self.position)
-        gl.glRotatef(self.rotate[0], 1, 0, 0)
-        gl.glRotatef(self.rotate[1], 0, 1, 0)
-        gl.glRotatef(self.rotate[2], 0, 0, 1)
-        gl.glScalef(*self.scale)
-
-    def _draw_mesh(self) -> None:
+        position, rotate, scale = np.array([self.position, self.rotate, self.scale])
+        if alpha < 1.0 and self.previous_state is not None:
+            previous_position, previous_rotate, previous_scale = self.previous_state
+            position = previous_position + (position - previous_position) * alpha
+            # Rotate by the shortest way when the angle crosses 360 degrees
+            rotate = previous_rotate + ((rotate - previous_rotate + 180) % 360 - 180) * alpha
+            scale = previous_scale + (scale - previous_scale) * alpha
+        gl.glTranslatef(*position)
+        gl.glRotatef(rotate[0], 1, 0, 0)
+        gl.glRotatef(rotate[1], 0, 1, 0)
+        gl.glRotatef(rotate[2], 0, 0, 1)
+        gl.glScalef(*scale)
+
+    def _draw_mesh(
+            self,
+            alpha: float = 1.0,
+    ) -> None:
         """
         Render sprite's mesh
+        :param alpha: Part of the time between the previous and the last step of animation to draw the sprite at
         :return:
         """
         gl.glPushMatrix()
-        self._apply_transforms()
-        gl.glBindVertexArray(self._vao)
-        gl.glDrawArrays(gl.GL_TRIANGLES, 0, self._vertices_count)
-        gl.glBindVertexArray(0)
+        self._apply_transforms(alpha)
+        GlState.bind_vertex_array(self._vao)
+        self._mesh.draw()
         gl.glPopMatrix()
 
-    def render(self) -> None:
+    @property
+    def timer(self) -> float:
+        """
+        :return: Value of the animation timer of the shader
+        """
+        return self._time_counter
+
+    def step_timer(self) -> None:
+        """
+        Move the animation timer of the shader one step forward
+        :return:
+        """
+        self._time_counter += self.step_animation_timer
+        # If timer came to border - go back
+        if self._time_counter >= self.max_animation_timer or self._time_counter <= 0:
+            self.step_animation_timer = -self.step_animation_timer
+
+    def save_state(self) -> None:
+        """
+        Remember position, rotation and scale before the next step of animation
+        :return:
+        """
+        self.previous_state = np.array([self.position, self.rotate, self.scale])
+
+    def render(
+            self,
+            alpha: float = 1.0,
+    ) -> None:
         """
-        Render sprite with attached texture and shader
+        Render sprite alone with attached texture and shader. Sprites of the scene are drawn by SpriteBatch
+        :param alpha: Part of the time between the previous and the last step of animation to draw the sprite at
         :return:
         """
         gl.glColor3f(*self.color)
-        gl.glBindTexture(gl.GL_TEXTURE_2D, self._texid)
-        gl.glUseProgram(self._shader)
+        GlState.bind_texture(self._texid)
+        GlState.use_program(self._shader)
         if self._shader != 0:
-            # Send timer value to the shader
-            location = gl.glGetUniformLocation(self._shader, "timer")
-            gl.glUniform1f(location, self._time_counter)
-            self._time_counter += self.step_animation_timer
-            # If timer came to border - go back
-            if self._time_counter >= self.max_animation_timer or self._time_counter <= 0:
-                self.step_animation_timer = -self.step_animation_timer
-        self._draw_mesh()
-        gl.glUseProgram(0)
+            # Transforms are applied to the modelview matrix here, so the model matrix of the shader is identity
+            for column in range(4):
+                gl.glVertexAttrib4f(MODEL_LOCATION + column, *np.eye(4)[column])
+            gl.glVertexAttrib4f(SPRITE_LOCATION, *self.color, self._time_counter)
+        self._draw_mesh(alpha)
 
     def animation(self) -> None:
         """
@@ -113,35 +185,19 @@ class Drawing:
         """
         pass
 
+    def release(self) -> None:
+        """
+        Free OpenGL objects of the sprite. The sprite can't be rendered after that
+        :return:
+        """
+        if self._released:
+            return
+        self._released = True
+        GpuResources.release('texture', self._texid)
+
     def get_child_sprites(self) -> List[Drawing]:
         """
         Override this method to return all Drawings that child for the current one
         :return: List of child drawings
         """
         return []
-
-    @staticmethod
-    def _mesh_create(
-            grid_size_x: int = 5,
-            grid_size_y: int = 5,
-    ) -> List[float]:
-        """
-        Create mesh of selected size
-        :param grid_size_x: Mesh elements along axis X
-        :param grid_size_y: Mesh elements along axis Y
-        :return: List of vertices coordinates
-        """
-        vertices = []
-        step_x = 1 / grid_size_x
-        step_y = 1 / grid_size_y
-
-        for y in np.arange(-0.5, 0.5, step_y):
-            for x in np.arange(-0.5, 0.5, step_x):
-                vertices += [x, y, 0.0,
-                             x + step_x, y, 0.0,
-                             x, y + step_y, 0.0,
-                             x + step_x, y, 0.0,
-                             x, y + step_y, 0.0,
-                             x + step_x, y + step_y, 0.0,
-                             ]
-        return vertices
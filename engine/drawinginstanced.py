@@ -0,0 +1,109 @@
+import OpenGL.GL as gl
+import numpy as np
+
+from engine.drawing import Drawing
+from engine.glstate import GlState
+from engine.gpuresources import GpuResources
+
+INSTANCED_SHADER_CODE = """
+attribute vec4 instance;
+void main() {
+    vec4 vertex = vec4(gl_Vertex.xy * instance.w + instance.xy, instance.z, 1.0);
+    gl_Position = gl_ModelViewProjectionMatrix * vertex;
+    gl_FrontColor = gl_Color;
+    gl_TexCoord[0] = gl_MultiTexCoord0;
+}
+"""
+
+
+class DrawingInstanced(Drawing):
+    """
+    Draw many copies of the same square sprite with one draw call
+    """
+
+    batched = False
+
+    def __init__(
+            self,
+            texid: int,
+            shader: int,
+    ):
+        """
+        Create buffer for positions and sizes of the copies
+        :param texid: ID of texture
+        :param shader: ID of shader compiled from INSTANCED_SHADER_CODE or compatible with it
+        """
+        super(DrawingInstanced, self).__init__(texid, 1, 1, shader)
+
+        # Every row is X, Y, Z and size of a copy
+        self.instances = np.zeros((0, 4), np.float32)
+        # Copies before the last step of animation in the same rows to interpolate them while rendering.
+        # None if the copies can't be interpolated
+        self.previous_instances = None
+
+        self._instances_buffer = gl.glGenBuffers(1)
+        location = gl.glGetAttribLocation(shader, "instance")
+        if location < 0:
+            raise RuntimeError('Shader has no "instance" attribute')
+
+        # Instance attribute is a state of vertex array, so the shared mesh needs an own vertex array here
+        self._vao = gl.glGenVertexArrays(1)
+        GlState.bind_vertex_array(self._vao)
+        self._mesh.bind_attributes()
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self._instances_buffer)
+        gl.glEnableVertexAttribArray(location)
+        gl.glVertexAttribPointer(location, 4, gl.GL_FLOAT, gl.GL_FALSE, 0, None)
+        # Take the next row of the buffer for every copy instead of every vertex
+        gl.glVertexAttribDivisor(location, 1)
+        GlState.bind_vertex_array(0)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+
+        GpuResources.add('buffer', self._instances_buffer)
+        GpuResources.retain('buffer', self._instances_buffer)
+        GpuResources.add('vertex_array', self._vao)
+        GpuResources.retain('vertex_array', self._vao)
+
+    def release(self) -> None:
+        """
+        Free OpenGL objects of the sprite and its copies
+        :return:
+        """
+        if self._released:
+            return
+        super(DrawingInstanced, self).release()
+        GpuResources.release('buffer', self._instances_buffer)
+        GpuResources.release('vertex_array', self._vao)
+
+    def render(
+            self,
+            alpha: float = 1.0,
+    ) -> None:
+        """
+        Upload positions of all the copies and render them at once
+        :param alpha: Part of the time between the previous and the last step of animation to draw copies at
+        :return:
+        """
+        instances_count = len(self.instances)
+        if instances_count == 0:
+            return
+
+        instances = self.instances
+        if alpha < 1.0 and self.previous_instances is not None and len(self.previous_instances) == instances_count:
+            instances = self.previous_instances + (instances - self.previous_instances) * alpha
+        instances = np.ascontiguousarray(instances, np.float32)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self._instances_buffer)
+        # Buffer is allocated again every frame, so the driver doesn't wait for the previous frame
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, instances.nbytes, instances, gl.GL_STREAM_DRAW)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        GpuResources.resize('buffer', self._instances_buffer, instances.nbytes)
+
+        gl.glColor3f(*self.color)
+        GlState.bind_texture(self._texid)
+        GlState.use_program(self._shader)
+        gl.glPushMatrix()
+        self._apply_transforms(alpha)
+        GlState.bind_vertex_array(self._vao)
+        gl.glDrawElementsInstanced(gl.GL_TRIANGLES, self._mesh.indices_count, gl.GL_UNSIGNED_INT, None,
+                                   instances_count)
+        GlState.count_draw_call()
+        gl.glPopMatrix()
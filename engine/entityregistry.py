@@ -0,0 +1,151 @@
+from collections import OrderedDict
+from itertools import count
+from typing import Dict, Optional, ValuesView
+
+from engine.drawing import Drawing
+from engine.scene import Scene
+
+
+class EntityRegistry:
+    """
+    Sprites of the scene by stable handles and kinds. Adding, removing and finding sprites take constant time,
+    and sprites of every kind are kept in the order of adding. Depth of registered sprites should be changed
+    by set_depth(), so the order of drawing follows it
+    """
+
+    def __init__(
+            self,
+            scene: Scene,
+    ):
+        """
+        Create empty registry
+        :param scene: Scene to draw the registered sprites
+        """
+        self.scene = scene
+        self._handles = count(1)
+        self._drawings: Dict[int, Drawing] = {}
+        self._drawing_handles: Dict[Drawing, int] = {}
+        self._kinds: Dict[int, str] = {}
+        # Dictionaries keep the order of adding, so they are used as ordered sets
+        self._views: Dict[str, Dict[int, Drawing]] = {}
+        # Ordered dictionary takes the oldest item in constant time however many items were taken before
+        self._eviction_queue: Dict[int, None] = OrderedDict()
+
+    def add(
+            self,
+            drawing: Drawing,
+            kind: str,
+            evictable: bool = False,
+    ) -> int:
+        """
+        Register the sprite and add it to the scene
+        :param drawing: Sprite to add
+        :param kind: Kind of the sprite to find it among sprites of the same kind
+        :param evictable: Put the sprite to the end of the eviction queue
+        :return: Handle of the sprite. It doesn't change while the sprite is registered
+        """
+        handle = next(self._handles)
+        self._drawings[handle] = drawing
+        self._drawing_handles[drawing] = handle
+        self._kinds[handle] = kind
+        self._views.setdefault(kind, {})[handle] = drawing
+        if evictable:
+            self._eviction_queue[handle] = None
+        self.scene.append(drawing)
+        return handle
+
+    def remove(
+            self,
+            handle: int,
+    ) -> None:
+        """
+        Remove the sprite from the scene and release it
+        :param handle: Handle of the sprite
+        :return:
+        """
+        drawing = self._drawings.pop(handle)
+        del self._drawing_handles[drawing]
+        del self._views[self._kinds.pop(handle)][handle]
+        self._eviction_queue.pop(handle, None)
+        self.scene.remove(drawing)
+        drawing.release()
+
+    def set_depth(
+            self,
+            handle: int,
+            depth: float,
+    ) -> None:
+        """
+        Move the sprite along axis Z and put it to its new place in the order of drawing
+        :param handle: Handle of the sprite
+        :param depth: New Z position of the sprite
+        :return:
+        """
+        drawing = self._drawings[handle]
+        drawing.position[2] = depth
+        self.scene.update(drawing)
+
+    def get(
+            self,
+            handle: int,
+    ) -> Drawing:
+        """
+        :param handle: Handle of the sprite
+        :return: Registered sprite
+        """
+        return self._drawings[handle]
+
+    def handle(
+            self,
+            drawing: Drawing,
+    ) -> int:
+        """
+        :param drawing: Registered sprite
+        :return: Handle of the sprite
+        """
+        return self._drawing_handles[drawing]
+
+    def view(
+            self,
+            kind: str,
+    ) -> ValuesView[Drawing]:
+        """
+        Get all the sprites of the kind. The view follows changes of the registry, so it shouldn't be iterated
+        while sprites are added or removed
+        :param kind: Kind of sprites
+        :return: Sprites in the order of adding
+        """
+        return self._views.setdefault(kind, {}).values()
+
+    def evict(self) -> Optional[Drawing]:
+        """
+        Take the oldest sprite out of the eviction queue. The sprite stays registered
+        :return: Sprite or None if the queue is empty
+        """
+        if not self._eviction_queue:
+            return None
+        handle, _ = self._eviction_queue.popitem(last=False)
+        return self._drawings[handle]
+
+    @property
+    def eviction_queue_size(self) -> int:
+        """
+        :return: Amount of sprites in the eviction queue
+        """
+        return len(self._eviction_queue)
+
+    def __len__(self) -> int:
+        """
+        :return: Amount of registered sprites
+        """
+        return len(self._drawings)
+
+    def __contains__(
+            self,
+            handle: int,
+    ) -> bool:
+        """
+        :param handle: Handle of a sprite
+        :return: True if the sprite is registered
+        """
+        return handle in self._drawings
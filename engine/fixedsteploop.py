@@ -0,0 +1,105 @@
+import time
+from typing import Callable, Optional
+
+import OpenGL.GLUT as glut
+
+from engine.renderer import Renderer
+from engine.scene import Scene
+
+
+class FixedStepLoop:
+    """
+    Main loop which animates the scene with a fixed time step and renders it as often as the display allows.
+    Sprites are drawn between the last two steps of animation, so the motion is smooth at any frame rate
+    """
+
+    def __init__(
+            self,
+            renderer: Renderer,
+            scene: Scene,
+            update: Optional[Callable[[], None]] = None,
+            step: float = 1 / 60,
+            max_steps: int = 5,
+            max_fps: float = 0.0,
+    ):
+        """
+        Setup timing of the loop
+        :param renderer: Object of the Engine to draw the scene
+        :param scene: Scene to animate and draw
+        :param update: Function to call after every step of animation
+        :param step: Time of one step of animation in seconds
+        :param max_steps: Maximum amount of steps per frame. The animation slows down if frames take longer
+        :param max_fps: Limit of frames per second. Select 0 to render as fast as the display allows
+        """
+        self.step = step
+        self.max_steps = max_steps
+        self.max_fps = max_fps
+        self._renderer = renderer
+        self._scene = scene
+        self._update = update
+
+        self._accumulator = 0.0
+        self._last_time = None
+        self._next_frame_time = None
+
+    def start(self) -> None:
+        """
+        Register the loop in GLUT. glutMainLoop should be called after it
+        :return:
+        """
+        glut.glutDisplayFunc(self._display)
+        self._last_time = None
+
+    def _display(self) -> None:
+        """
+        GLUT display callback. Draw a frame and ask for the next one at once
+        :return:
+        """
+        self.tick()
+        glut.glutPostRedisplay()
+
+    def tick(self) -> int:
+        """
+        Animate the scene for the time passed since the previous call and draw it
+        :return: Amount of made steps of animation
+        """
+        # Wait before the frame, so the profiler adds the waiting to this frame. Frames end in render()
+        self._pace()
+        now = time.perf_counter()
+        if self._last_time is None:
+            self._last_time = now
+        self._accumulator += now - self._last_time
+        self._last_time = now
+
+        steps = 0
+        while self._accumulator >= self.step and steps < self.max_steps:
+            self._renderer.animate(self._scene)
+            if self._update is not None:
+                self._update()
+            self._accumulator -= self.step
+            steps += 1
+        if self._accumulator >= self.step:
+            # Frames are too slow to catch up, drop the rest of the time instead of running more and more steps
+            self._accumulator %= self.step
+
+        self._renderer.render(self._scene, alpha=self._accumulator / self.step)
+        return steps
+
+    def _pace(self) -> None:
+        """
+        Wait until the time of the next frame if frames per second are limited. The first frame doesn't wait
+        :return:
+        """
+        if self.max_fps <= 0:
+            return
+        interval = 1 / self.max_fps
+        now = time.perf_counter()
+        if self._next_frame_time is None or now - self._next_frame_time > interval:
+            # The first frame or the frame was late, start counting from now
+            self._next_frame_time = now + interval
+            return
+        with self._renderer.profiler.phase('pacing'):
+            delay = self._next_frame_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        self._next_frame_time += interval
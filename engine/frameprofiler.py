@@ -0,0 +1,146 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager, Dict, Iterator, List, Optional
+
+
+class FrameProfiler:
+    """
+    Measure time of frame phases. Phases can be measured from any thread. Nothing is measured while disabled
+    """
+
+    def __init__(
+            self,
+            history_size: int = 240,
+            max_trace_events: int = 1000000,
+    ):
+        """
+        Create disabled profiler
+        :param history_size: Amount of frames to keep for graphs
+        :param max_trace_events: Maximum amount of events in the trace. Later events are dropped
+        """
+        self.enabled = False
+        self._max_trace_events = max_trace_events
+        # Milliseconds spent in every phase during the last frames
+        self._history = deque(maxlen=history_size)
+        self._current: Dict[str, float] = {}
+        self._frame_start = time.perf_counter()
+        self._lock = threading.Lock()
+        # Events in the format of Chrome trace while tracing
+        self._trace_events: Optional[List[dict]] = None
+        self._null_context = nullcontext()
+
+    def phase(
+            self,
+            name: str,
+    ) -> ContextManager:
+        """
+        Measure time of the code inside the with statement
+        :param name: Name of the phase
+        :return: Context manager
+        """
+        if not self.enabled:
+            return self._null_context
+        return self._measure(name)
+
+    @contextmanager
+    def _measure(
+            self,
+            name: str,
+    ) -> Iterator[None]:
+        """
+        Measure time of the phase and add it to the current frame and the trace
+        :param name: Name of the phase
+        :return: Context manager
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self._current[name] = self._current.get(name, 0.0) + (end - start) * 1000
+                if self._trace_events is not None and len(self._trace_events) < self._max_trace_events:
+                    self._trace_events.append({
+                        'name': name,
+                        'ph': 'X',
+                        'ts': start * 1e6,
+                        'dur': (end - start) * 1e6,
+                        'pid': os.getpid(),
+                        'tid': threading.get_ident(),
+                    })
+
+    def end_frame(self) -> None:
+        """
+        Finish the current frame and add it to the history
+        :return:
+        """
+        now = time.perf_counter()
+        if not self.enabled:
+            self._frame_start = now
+            return
+        with self._lock:
+            self._current['frame'] = (now - self._frame_start) * 1000
+            self._history.append(self._current)
+            self._current = {}
+            if self._trace_events is not None and len(self._trace_events) < self._max_trace_events:
+                self._trace_events.append({
+                    'name': 'frame',
+                    'ph': 'X',
+                    'ts': self._frame_start * 1e6,
+                    'dur': (now - self._frame_start) * 1e6,
+                    'pid': os.getpid(),
+                    'tid': threading.get_ident(),
+                })
+        self._frame_start = now
+
+    def history(self) -> List[Dict[str, float]]:
+        """
+        :return: Milliseconds spent in every phase during the last frames from the oldest to the newest
+        """
+        with self._lock:
+            return list(self._history)
+
+    @property
+    def tracing(self) -> bool:
+        """
+        :return: True if events are recorded for the trace
+        """
+        return self._trace_events is not None
+
+    def start_trace(self) -> None:
+        """
+        Start recording events for the trace
+        :return:
+        """
+        with self._lock:
+            self._trace_events = []
+
+    def save_trace(
+            self,
+            path: str,
+    ) -> None:
+        """
+        Stop recording and save the trace in the Chrome trace event format. Open it in chrome://tracing
+        :param path: Path to the JSON file
+        :return:
+        """
+        with self._lock:
+            events = self._trace_events or []
+            self._trace_events = None
+
+        # Names of threads for the trace viewer
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for tid in sorted({event['tid'] for event in events}):
+            events.append({
+                'name': 'thread_name',
+                'ph': 'M',
+                'pid': os.getpid(),
+                'tid': tid,
+                'args': {'name': names.get(tid, str(tid))},
+            })
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
@@ -0,0 +1,87 @@
+from typing import Dict
+
+import OpenGL.GL as gl
+
+
+class GlState:
+    """
+    Cache of bound OpenGL objects. Binding of an already bound object is skipped
+    """
+
+    _program = None
+    _texture = None
+    _vertex_array = None
+
+    # Amount of draw calls and made and skipped changes of the state since the last reset
+    _counters: Dict[str, int] = {'draw_calls': 0, 'program': 0, 'texture': 0, 'vertex_array': 0, 'skipped': 0}
+
+    @classmethod
+    def use_program(cls, program: int) -> None:
+        """
+        Use shader program
+        :param program: ID of program or 0 to use fixed pipeline
+        :return:
+        """
+        if cls._program == program:
+            cls._counters['skipped'] += 1
+            return
+        gl.glUseProgram(program)
+        cls._program = program
+        cls._counters['program'] += 1
+
+    @classmethod
+    def bind_texture(cls, texid: int) -> None:
+        """
+        Bind 2D texture
+        :param texid: ID of texture
+        :return:
+        """
+        if cls._texture == texid:
+            cls._counters['skipped'] += 1
+            return
+        gl.glBindTexture(gl.GL_TEXTURE_2D, texid)
+        cls._texture = texid
+        cls._counters['texture'] += 1
+
+    @classmethod
+    def bind_vertex_array(cls, vao: int) -> None:
+        """
+        Bind vertex array
+        :param vao: ID of vertex array
+        :return:
+        """
+        if cls._vertex_array == vao:
+            cls._counters['skipped'] += 1
+            return
+        gl.glBindVertexArray(vao)
+        cls._vertex_array = vao
+        cls._counters['vertex_array'] += 1
+
+    @classmethod
+    def count_draw_call(cls) -> None:
+        """
+        Count one more draw call
+        :return:
+        """
+        cls._counters['draw_calls'] += 1
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """
+        Forget the cached state after OpenGL objects are bound without the cache
+        :return:
+        """
+        cls._program = None
+        cls._texture = None
+        cls._vertex_array = None
+
+    @classmethod
+    def reset_counters(cls) -> Dict[str, int]:
+        """
+        Start counting draw calls and changes of the state from zero
+        :return: Counters before the reset
+        """
+        counters = dict(cls._counters)
+        for key in cls._counters:
+            cls._counters[key] = 0
+        return counters
@@ -0,0 +1,109 @@
+from typing import Callable, Dict, Tuple
+
+import OpenGL.GL as gl
+
+from engine.glstate import GlState
+
+# Functions to delete OpenGL objects of every type
+_DELETERS: Dict[str, Callable[[int], None]] = {
+    'texture': lambda object_id: gl.glDeleteTextures([object_id]),
+    'buffer': lambda object_id: gl.glDeleteBuffers(1, [object_id]),
+    'vertex_array': lambda object_id: gl.glDeleteVertexArrays(1, [object_id]),
+}
+
+
+class GpuResources:
+    """
+    Reference counting of OpenGL objects. An object is deleted when the last sprite using it releases it
+    """
+
+    # References count and size in bytes by the type and ID of an object
+    _objects: Dict[Tuple[str, int], list] = {}
+
+    @classmethod
+    def add(
+            cls,
+            kind: str,
+            object_id: int,
+            size: int = 0,
+    ) -> int:
+        """
+        Start tracking a new object. It has no references until somebody retains it
+        :param kind: Type of the object: 'texture', 'buffer' or 'vertex_array'
+        :param object_id: OpenGL ID of the object
+        :param size: Size of the object in the GPU memory in bytes
+        :return: OpenGL ID of the object
+        """
+        if kind not in _DELETERS:
+            raise ValueError(f'Unknown type of OpenGL object: {kind}')
+        cls._objects[(kind, int(object_id))] = [0, int(size)]
+        return object_id
+
+    @classmethod
+    def resize(
+            cls,
+            kind: str,
+            object_id: int,
+            size: int,
+    ) -> None:
+        """
+        Update size of the object after its storage is allocated again
+        :param kind: Type of the object
+        :param object_id: OpenGL ID of the object
+        :param size: New size of the object in bytes
+        :return:
+        """
+        record = cls._objects.get((kind, int(object_id)))
+        if record is not None:
+            record[1] = int(size)
+
+    @classmethod
+    def retain(
+            cls,
+            kind: str,
+            object_id: int,
+    ) -> None:
+        """
+        Add a reference to the object. Untracked objects are ignored
+        :param kind: Type of the object
+        :param object_id: OpenGL ID of the object
+        :return:
+        """
+        record = cls._objects.get((kind, int(object_id)))
+        if record is not None:
+            record[0] += 1
+
+    @classmethod
+    def release(
+            cls,
+            kind: str,
+            object_id: int,
+    ) -> None:
+        """
+        Remove a reference to the object and delete it when there are no references anymore
+        :param kind: Type of the object
+        :param object_id: OpenGL ID of the object
+        :return:
+        """
+        key = (kind, int(object_id))
+        record = cls._objects.get(key)
+        if record is None:
+            return
+        record[0] -= 1
+        if record[0] <= 0:
+            del cls._objects[key]
+            _DELETERS[kind](int(object_id))
+            # ID of the deleted object can be given to a new one, so the cache can't trust it anymore
+            GlState.invalidate()
+
+    @classmethod
+    def stats(cls) -> Dict[str, Dict[str, int]]:
+        """
+        Count live objects and their memory
+        :return: Amount of objects and bytes by the type of objects
+        """
+        result = {kind: {'objects': 0, 'bytes': 0} for kind in _DELETERS}
+        for (kind, _), (_, size) in cls._objects.items():
+            result[kind]['objects'] += 1
+            result[kind]['bytes'] += size
+        return result
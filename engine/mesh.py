@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from typing import Dict, Tuple
+
+import OpenGL.GL as gl
+import OpenGL.arrays.vbo as glvbo
+import numpy as np
+
+from engine.glstate import GlState
+from engine.gpuresources import GpuResources
+
+
+class Mesh:
+    """
+    Grid mesh of a sprite. Meshes are shared by all sprites with the same grid size
+    """
+
+    # Created meshes by the grid size
+    _registry: Dict[Tuple[int, int], Mesh] = {}
+
+    def __init__(
+            self,
+            grid_x: int = 5,
+            grid_y: int = 5,
+    ):
+        """
+        Create mesh and upload it to the GPU
+        :param grid_x: Mesh elements along axis X
+        :param grid_y: Mesh elements along axis Y
+        """
+        vertices, texcoords, indices = self.create_grid(grid_x, grid_y)
+        self.indices_count = len(indices)
+        self._vbo_vertices = glvbo.VBO(vertices)
+        self._vbo_texcoords = glvbo.VBO(texcoords)
+        self._vbo_indices = glvbo.VBO(indices, target=gl.GL_ELEMENT_ARRAY_BUFFER)
+
+        self.vao = gl.glGenVertexArrays(1)
+        GlState.bind_vertex_array(self.vao)
+        self.bind_attributes()
+        GlState.bind_vertex_array(0)
+
+        # Shared meshes live until the end of the program
+        for vbo, array in ((self._vbo_vertices, vertices),
+                           (self._vbo_texcoords, texcoords),
+                           (self._vbo_indices, indices)):
+            GpuResources.add('buffer', int(vbo), array.nbytes)
+            GpuResources.retain('buffer', int(vbo))
+        GpuResources.add('vertex_array', self.vao)
+        GpuResources.retain('vertex_array', self.vao)
+
+    @classmethod
+    def get(
+            cls,
+            grid_x: int = 5,
+            grid_y: int = 5,
+    ) -> Mesh:
+        """
+        Get shared mesh of the selected size. It is created only once
+        :param grid_x: Mesh elements along axis X
+        :param grid_y: Mesh elements along axis Y
+        :return: Mesh object
+        """
+        mesh = cls._registry.get((grid_x, grid_y))
+        if mesh is None:
+            mesh = cls(grid_x, grid_y)
+            cls._registry[(grid_x, grid_y)] = mesh
+        return mesh
+
+    def bind_attributes(self) -> None:
+        """
+        Attach vertices, texture coordinates and indices of the mesh to the bound vertex array
+        :return:
+        """
+        gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
+        gl.glEnableClientState(gl.GL_TEXTURE_COORD_ARRAY)
+
+        self._vbo_vertices.bind()
+        gl.glVertexPointer(3, gl.GL_FLOAT, 0, None)
+        self._vbo_texcoords.bind()
+        gl.glTexCoordPointer(2, gl.GL_FLOAT, 0, None)
+        self._vbo_indices.bind()
+
+    def draw(self) -> None:
+        """
+        Draw triangles of the mesh. Vertex array of the mesh should be bound
+        :return:
+        """
+        gl.glDrawElements(gl.GL_TRIANGLES, self.indices_count, gl.GL_UNSIGNED_INT, None)
+        GlState.count_draw_call()
+
+    @staticmethod
+    def create_grid(
+            grid_x: int = 5,
+            grid_y: int = 5,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Create square grid from -0.5 to 0.5 along both axes
+        :param grid_x: Mesh elements along axis X
+        :param grid_y: Mesh elements along axis Y
+        :return: Array of vertices coordinates, array of texture coordinates and array of triangles indices
+        """
+        x, y = np.meshgrid(np.linspace(-0.5, 0.5, grid_x + 1, dtype=np.float32),
+                           np.linspace(-0.5, 0.5, grid_y + 1, dtype=np.float32))
+        vertices = np.stack([x.ravel(), y.ravel(), np.zeros(x.size, np.float32)], axis=1)
+        texcoords = vertices[:, :2] + 0.5
+
+        # Two triangles for every cell of the grid
+        cells = np.arange(grid_y)[:, None] * (grid_x + 1) + np.arange(grid_x)[None, :]
+        cells = cells.ravel()
+        row = grid_x + 1
+        indices = np.stack([cells, cells + 1, cells + row,
+                            cells + 1, cells + row, cells + row + 1], axis=1)
+        return vertices, np.ascontiguousarray(texcoords), indices.astype(np.uint32).ravel()
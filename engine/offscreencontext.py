@@ -0,0 +1,84 @@
+import ctypes
+import os
+
+import OpenGL.GL as gl
+import numpy as np
+
+
+class OffscreenContext:
+    """
+    OpenGL context without a window. Frames are rendered into a framebuffer in memory
+    """
+
+    def __init__(
+            self,
+            width: int,
+            height: int,
+    ):
+        """
+        Create EGL context and framebuffer. PYOPENGL_PLATFORM=egl should be set before OpenGL is imported.
+        Set EGL_PLATFORM=surfaceless to render with Mesa without any display
+        :param width: Width of the framebuffer
+        :param height: Height of the framebuffer
+        """
+        if os.environ.get('PYOPENGL_PLATFORM') != 'egl':
+            raise EnvironmentError('Set PYOPENGL_PLATFORM=egl before OpenGL is imported to render offscreen')
+        from OpenGL import EGL
+
+        self.width = width
+        self.height = height
+        self._egl = EGL
+
+        self._display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        if not EGL.eglInitialize(self._display, None, None):
+            raise EnvironmentError('EGL display is not available')
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+
+        # Surface type is window by default, but no surface is needed here
+        attributes = (EGL.EGLint * 5)(EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+                                      EGL.EGL_SURFACE_TYPE, 0, EGL.EGL_NONE)
+        config = EGL.EGLConfig()
+        configs_count = EGL.EGLint()
+        EGL.eglChooseConfig(self._display, attributes, ctypes.pointer(config), 1, ctypes.pointer(configs_count))
+        if configs_count.value == 0:
+            raise EnvironmentError('EGL has no configuration for desktop OpenGL')
+        self._context = EGL.eglCreateContext(self._display, config, EGL.EGL_NO_CONTEXT, None)
+        # Context is used without any surface, everything is drawn to the framebuffer below
+        if not EGL.eglMakeCurrent(self._display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, self._context):
+            raise EnvironmentError('EGL context can not be used without a surface')
+
+        self._framebuffer = gl.glGenFramebuffers(1)
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self._framebuffer)
+        self._renderbuffers = gl.glGenRenderbuffers(2)
+        for renderbuffer, storage, attachment in zip(self._renderbuffers,
+                                                     (gl.GL_RGBA8, gl.GL_DEPTH_COMPONENT24),
+                                                     (gl.GL_COLOR_ATTACHMENT0, gl.GL_DEPTH_ATTACHMENT)):
+            gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, renderbuffer)
+            gl.glRenderbufferStorage(gl.GL_RENDERBUFFER, storage, width, height)
+            gl.glFramebufferRenderbuffer(gl.GL_FRAMEBUFFER, attachment, gl.GL_RENDERBUFFER, renderbuffer)
+        gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, 0)
+        if gl.glCheckFramebufferStatus(gl.GL_FRAMEBUFFER) != gl.GL_FRAMEBUFFER_COMPLETE:
+            raise EnvironmentError('Offscreen framebuffer is not complete')
+
+    def read_pixels(self) -> np.ndarray:
+        """
+        Read the rendered frame
+        :return: RGBA image of the frame
+        """
+        data = gl.glReadPixels(0, 0, self.width, self.height, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE)
+        image = np.frombuffer(data, np.uint8).reshape(self.height, self.width, 4)
+        # OpenGL stores rows from the bottom to the top
+        return image[::-1].copy()
+
+    def release(self) -> None:
+        """
+        Delete the framebuffer and the context
+        :return:
+        """
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, 0)
+        gl.glDeleteFramebuffers(1, [self._framebuffer])
+        gl.glDeleteRenderbuffers(2, self._renderbuffers)
+        self._egl.eglMakeCurrent(self._display, self._egl.EGL_NO_SURFACE, self._egl.EGL_NO_SURFACE,
+                                 self._egl.EGL_NO_CONTEXT)
+        self._egl.eglDestroyContext(self._display, self._context)
+        self._egl.eglTerminate(self._display)
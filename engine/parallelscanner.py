@@ -0,0 +1,143 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional
+
+import cv2
+import numpy as np
+
+from engine.scancache import ScanCache
+from engine.simplescanner import Cutout, SimpleScanner
+
+# Scanner of the current worker process. Every worker gets its own copy
+_worker_scanner = None
+
+
+def _init_worker(scanner: SimpleScanner) -> None:
+    """
+    Store the scanner copy for the current worker process
+    :param scanner: Scanner received from the main process
+    :return:
+    """
+    global _worker_scanner
+    # Every process already works in parallel, so don't let OpenCV spawn extra threads
+    cv2.setNumThreads(1)
+    _worker_scanner = scanner
+
+
+def _scan_image(
+        data: bytes,
+        filename: str,
+) -> List[Cutout]:
+    """
+    Scan all the fish from the encoded photo in the worker process
+    :param data: Content of the photo file
+    :param filename: Path to the photo to report errors
+    :return: Images of fish with alpha channel. Empty list if markers are not found
+    """
+    frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError(f'Error reading image with filename: {filename}')
+    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    scanned_fish = _worker_scanner.scan_many(frame)
+    if len(scanned_fish) == 0:
+        print(f'{filename}: Markers in the image are not found')
+    return [_worker_scanner.trim(image) for image in scanned_fish]
+
+
+class ParallelScanner:
+    """
+    Scanner of many photos at once with a pool of worker processes
+    """
+
+    def __init__(
+            self,
+            scanner: SimpleScanner,
+            processes: Optional[int] = None,
+            cache: Optional[ScanCache] = None,
+    ):
+        """
+        Setup settings of the pool
+        :param scanner: Scanner with settings to copy in every worker
+        :param processes: Amount of worker processes. Select None to use all the CPUs
+        :param cache: Cache of already scanned photos. Select None to scan all the photos
+        """
+        self._scanner = scanner
+        self._cache = cache
+        self._processes = processes or os.cpu_count() or 1
+
+    def scan_files(
+            self,
+            filenames: List[str],
+    ) -> Iterator[List[Cutout]]:
+        """
+        Scan fish from the files in parallel
+        :param filenames: Paths to the photos of the fish drawings
+        :return: Generator of lists of the scanned fish in the same order as filenames.
+                 Lists are empty for the photos where markers are not found
+        """
+        if len(filenames) == 0:
+            return
+
+        # Look up the cache first, so only new photos are sent to the workers. Photos are not kept in memory
+        keys = []
+        missed = []
+        for i, filename in enumerate(filenames):
+            key = self._cache.key(self._read_file(filename)) if self._cache is not None else None
+            if key is None or key not in self._cache:
+                missed.append(i)
+            keys.append(key)
+
+        if len(missed) == 0:
+            for key in keys:
+                yield self._load_cached(key)
+            return
+
+        processes = min(self._processes, len(missed))
+        # Photos are read just before sending them and only a few of them are scanned ahead of the results
+        # waiting to be taken, so memory doesn't grow with the amount of photos
+        window = 2 * processes
+        # Workers are started from scratch, so they don't inherit OpenGL context of the main process
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                                 initializer=_init_worker, initargs=(self._scanner,)) as executor:
+            pending = deque()
+            unsent = iter(missed)
+            for i, key in enumerate(keys):
+                while len(pending) < window:
+                    j = next(unsent, None)
+                    if j is None:
+                        break
+                    pending.append((j, executor.submit(_scan_image, self._read_file(filenames[j]), filenames[j])))
+                if len(pending) > 0 and pending[0][0] == i:
+                    image = pending.popleft()[1].result()
+                    if self._cache is not None:
+                        self._cache.put(key, image)
+                    yield image
+                else:
+                    yield self._load_cached(key)
+
+    @staticmethod
+    def _read_file(filename: str) -> bytes:
+        """
+        Read the whole photo file
+        :param filename: Path to the photo
+        :return: Content of the file
+        """
+        with open(filename, 'rb') as file:
+            return file.read()
+
+    def _load_cached(
+            self,
+            key: str,
+    ) -> List[Cutout]:
+        """
+        Load scanned fish from the cache
+        :param key: Key of the cache entry
+        :return: Images of fish. Empty list if the entry is lost
+        """
+        images = self._cache.get(key)
+        if images is None:
+            return []
+        return images
@@ -0,0 +1,108 @@
+from typing import Dict, Tuple, Union
+
+import numpy as np
+
+
+class ParticleSystem:
+    """
+    Properties of many particles kept in contiguous arrays. Removed particles are replaced by the last ones,
+    so particles are always stored in the first `count` rows
+    """
+
+    def __init__(
+            self,
+            fields: Dict[str, Tuple[int, ...]],
+            capacity: int = 64,
+            dtype: type = np.float64,
+    ):
+        """
+        Allocate arrays for properties of particles
+        :param fields: Shape of every property of one particle by its name. Select () for a single value
+        :param capacity: Amount of particles to allocate memory for. It grows when needed
+        :param dtype: Type of values
+        """
+        self.count = 0
+        self._arrays = {name: np.zeros((capacity,) + shape, dtype) for name, shape in fields.items()}
+
+    @property
+    def capacity(self) -> int:
+        """
+        :return: Amount of particles the arrays have memory for. It changes when the arrays are allocated again
+        """
+        return len(next(iter(self._arrays.values())))
+
+    def __getitem__(
+            self,
+            name: str,
+    ) -> np.ndarray:
+        """
+        Get property of all the particles. Changes of the returned array change the particles
+        :param name: Name of the property
+        :return: View of the array with a row for every particle
+        """
+        return self._arrays[name][:self.count]
+
+    def __len__(self) -> int:
+        """
+        :return: Amount of particles
+        """
+        return self.count
+
+    def add(
+            self,
+            count: int = 1,
+            **values: Union[float, np.ndarray],
+    ) -> np.ndarray:
+        """
+        Add new particles. Properties which are not set are zeros
+        :param count: Amount of particles to add
+        :param values: Values of properties by their names. Each one is broadcast to all the added particles
+        :return: Indices of the added particles
+        """
+        if self.count + count > self.capacity:
+            self._grow(self.count + count)
+        for name, array in self._arrays.items():
+            array[self.count:self.count + count] = values.get(name, 0)
+        self.count += count
+        return np.arange(self.count - count, self.count)
+
+    def remove(
+            self,
+            indices: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Remove particles and move the last particles to their places
+        :param indices: Indices or boolean mask of particles to remove
+        :return: Old and new indices of the moved particles
+        """
+        if np.asarray(indices).dtype == bool:
+            indices = np.flatnonzero(indices)
+        else:
+            # Empty lists are float arrays for numpy, so the type of indices is set explicitly
+            indices = np.asarray(indices, dtype=np.intp)
+        indices = np.unique(indices)
+        new_count = self.count - len(indices)
+
+        # Particles from the tail which stay alive fill the holes before the new end
+        tail = np.arange(new_count, self.count)
+        moved_from = tail[~np.isin(tail, indices)]
+        moved_to = indices[indices < new_count]
+        for array in self._arrays.values():
+            array[moved_to] = array[moved_from]
+        self.count = new_count
+        return moved_from, moved_to
+
+    def _grow(
+            self,
+            count: int,
+    ) -> None:
+        """
+        Allocate bigger arrays and copy the particles into them
+        :param count: Amount of particles to fit
+        :return:
+        """
+        capacity = max(count, 2 * self.capacity)
+        for name, array in self._arrays.items():
+            grown = np.zeros((capacity,) + array.shape[1:], array.dtype)
+            grown[:self.count] = array[:self.count]
+            self._arrays[name] = grown
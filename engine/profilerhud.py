@@ -0,0 +1,104 @@
+import OpenGL.GL as gl
+import OpenGL.GLUT as glut
+import numpy as np
+
+from engine.frameprofiler import FrameProfiler
+from engine.glstate import GlState
+
+# Colors of the graphs by phases. Other phases are drawn gray
+PHASE_COLORS = {
+    'frame': (1.0, 1.0, 1.0),
+    'animate': (0.3, 0.9, 0.3),
+    'draw': (1.0, 0.6, 0.2),
+    'swap': (0.6, 0.6, 1.0),
+    'upload': (1.0, 0.3, 0.8),
+    'scene': (0.3, 0.9, 0.9),
+    'scan': (1.0, 1.0, 0.3),
+}
+
+
+class ProfilerHud:
+    """
+    Overlay with graphs of frame phases times over the last frames
+    """
+
+    def __init__(
+            self,
+            profiler: FrameProfiler,
+            aspect: float,
+            max_ms: float = 50.0,
+    ):
+        """
+        Create hidden overlay
+        :param profiler: Profiler with the measured phases
+        :param aspect: Aspect ratio of the screen
+        :param max_ms: Time at the top of the graph in milliseconds
+        """
+        self.visible = False
+        self.max_ms = max_ms
+        self._profiler = profiler
+
+        # Place of the graph in the scene coordinates. Y axis goes down
+        self._left = -aspect + 0.05
+        self._top = -0.95
+        self._width = 1.2
+        self._height = 0.5
+
+    def render(
+            self,
+            with_text: bool = True,
+    ) -> None:
+        """
+        Draw the overlay over the frame
+        :param with_text: Draw names and average times of phases. Text needs a GLUT window
+        :return:
+        """
+        history = self._profiler.history()
+        if len(history) < 2:
+            return
+
+        GlState.use_program(0)
+        GlState.bind_vertex_array(0)
+        gl.glDisable(gl.GL_TEXTURE_2D)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+
+        bottom = self._top + self._height
+        # Background and the line of 60 frames per second
+        gl.glColor4f(0.0, 0.0, 0.0, 0.5)
+        self._draw(gl.GL_QUADS, [[self._left, self._top], [self._left + self._width, self._top],
+                                 [self._left + self._width, bottom], [self._left, bottom]])
+        frame_60 = bottom - self._height * min(1000 / 60 / self.max_ms, 1.0)
+        gl.glColor3f(0.8, 0.2, 0.2)
+        self._draw(gl.GL_LINES, [[self._left, frame_60], [self._left + self._width, frame_60]])
+
+        names = sorted({name for frame in history for name in frame})
+        x = self._left + np.linspace(0, self._width, len(history))
+        for i, name in enumerate(names):
+            times = np.array([frame.get(name, 0.0) for frame in history])
+            y = bottom - self._height * np.minimum(times / self.max_ms, 1.0)
+            color = PHASE_COLORS.get(name, (0.6, 0.6, 0.6))
+            gl.glColor3f(*color)
+            self._draw(gl.GL_LINE_STRIP, np.stack([x, y], axis=1))
+
+            if with_text:
+                gl.glRasterPos2f(self._left + self._width + 0.03, self._top + 0.05 + i * 0.06)
+                text = f'{name}: {times.mean():.1f} ms'
+                for character in text.encode():
+                    glut.glutBitmapCharacter(glut.GLUT_BITMAP_HELVETICA_12, character)
+
+        gl.glEnable(gl.GL_TEXTURE_2D)
+
+    @staticmethod
+    def _draw(
+            mode: gl.Constant,
+            points: np.ndarray,
+    ) -> None:
+        """
+        Draw primitives from the points in memory
+        :param mode: Type of primitives
+        :param points: Coordinates of points (N, 2)
+        :return:
+        """
+        points = np.ascontiguousarray(points, np.float32)
+        gl.glVertexPointer(2, gl.GL_FLOAT, 0, points)
+        gl.glDrawArrays(mode, 0, len(points))
@@ -1,13 +1,21 @@
 import sys
-from queue import Queue
-from typing import List
+from typing import Optional, Tuple
 
 import OpenGL.GL as gl
 import OpenGL.GLUT as glut
 import cv2
 import numpy as np
 
-from engine.drawing import Drawing
+from engine.drawing import MODEL_LOCATION, SPRITE_LOCATION, SPRITE_SHADER_CODE
+from engine.frameprofiler import FrameProfiler
+from engine.glstate import GlState
+from engine.gpuresources import GpuResources
+from engine.offscreencontext import OffscreenContext
+from engine.profilerhud import ProfilerHud
+from engine.scene import Scene
+from engine.shaderprogram import ShaderProgram
+from engine.spritebatch import SpriteBatch
+from engine.textureuploader import TextureUploader
 
 
 class Renderer:
@@ -15,14 +23,29 @@ class Renderer:
     Core of the Engine
     """
 
-    def __init__(self):
+    # Folder to keep linked shader programs. Select None to compile shaders at every start
+    shader_cache_directory: Optional[str] = None
+
+    def __init__(
+            self,
+            offscreen_size: Optional[Tuple[int, int]] = None,
+    ):
         """
-        Initialize and create GLUT window
+        Initialize and create GLUT window or offscreen context
+        :param offscreen_size: Size of the frame (width, height) to render without a window.
+                               Select None to open a fullscreen window
         """
-        glut.glutInit(sys.argv)
-        glut.glutInitDisplayMode(glut.GLUT_DOUBLE | glut.GLUT_RGBA | glut.GLUT_DEPTH)
-        glut.glutCreateWindow("OpenGL")
-        glut.glutFullScreen()
+        self.offscreen = None
+        if offscreen_size is None:
+            glut.glutInit(sys.argv)
+            glut.glutInitDisplayMode(glut.GLUT_DOUBLE | glut.GLUT_RGBA | glut.GLUT_DEPTH)
+            glut.glutCreateWindow("OpenGL")
+            glut.glutFullScreen()
+            width = glut.glutGet(glut.GLUT_SCREEN_WIDTH)
+            height = glut.glutGet(glut.GLUT_SCREEN_HEIGHT)
+        else:
+            self.offscreen = OffscreenContext(*offscreen_size)
+            width, height = offscreen_size
 
         gl.glEnable(gl.GL_TEXTURE_2D)
         gl.glDisable(gl.GL_LIGHTING)
@@ -31,8 +54,6 @@ class Renderer:
         gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
 
         # Modify matrices for screen size
-        width = glut.glutGet(glut.GLUT_SCREEN_WIDTH)
-        height = glut.glutGet(glut.GLUT_SCREEN_HEIGHT)
         gl.glViewport(0, 0, width, height)
         gl.glMatrixMode(gl.GL_PROJECTION)
         aspect = width / height
@@ -41,58 +62,58 @@ class Renderer:
         gl.glMatrixMode(gl.GL_MODELVIEW)
         gl.glLoadIdentity()
 
-    @staticmethod
-    def render(drawings_list: List[Drawing]) -> None:
+        self._batch = SpriteBatch(self.create_shader(gl.GL_VERTEX_SHADER, SPRITE_SHADER_CODE))
+        self.profiler = FrameProfiler()
+        self.hud = ProfilerHud(self.profiler, aspect)
+        # Textures of new sprites are uploaded in parts between frames
+        self.uploader = TextureUploader()
+        # Draw calls and changes of programs, textures and vertex arrays made during the last frame
+        self.frame_stats = {}
+
+    def render(
+            self,
+            scene: Scene,
+            alpha: float = 1.0,
+    ) -> None:
         """
         Draw all sprites
-        :param drawings_list: List of sprites to draw
+        :param scene: Scene with sprites to draw
+        :param alpha: Part of the time between the previous and the last step of animation to draw sprites at
         :return:
         """
         gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
-
-        extended_drawings_list = []
-        drawings_queue = Queue()
-        for drawing in drawings_list:
-            extended_drawings_list.append(drawing)
-            for child in drawing.get_child_sprites():
-                drawings_queue.put(child)
-
-        while drawings_queue.qsize() > 0:
-            drawing = drawings_queue.get()
-            extended_drawings_list.append(drawing)
-            for child in drawing.get_child_sprites():
-                drawings_queue.put(child)
-
-
-        sorted_drawings_list = sorted(extended_drawings_list, key=lambda x: x.position[2])
-        for drawing in sorted_drawings_list:
-            drawing.render()
-
-        gl.glFlush()
-        glut.glutSwapBuffers()
+        GlState.reset_counters()
+        with self.profiler.phase('upload'):
+            self.uploader.process()
+        with self.profiler.phase('draw'):
+            # Scene keeps sprites in the order of drawing
+            self._batch.render(scene.drawings, alpha)
+            self.frame_stats = GlState.reset_counters()
+            if self.hud.visible:
+                self.hud.render(with_text=self.offscreen is None)
+
+        with self.profiler.phase('swap'):
+            gl.glFlush()
+            if self.offscreen is None:
+                glut.glutSwapBuffers()
+        self.profiler.end_frame()
 
     def animate(
             self,
-            drawings_list: List[Drawing],
+            scene: Scene,
     ) -> None:
         """
         Perform one step of animation
-        :param drawings_list: List of sprites to animate
+        :param scene: Scene with sprites to animate
         :return:
         """
-        drawings_queue = Queue()
-        for drawing in drawings_list:
-            drawing.animation()
-            for child in drawing.get_child_sprites():
-                drawings_queue.put(child)
-
-        while drawings_queue.qsize() > 0:
-            drawing = drawings_queue.get()
-            drawing.animation()
-            for child in drawing.get_child_sprites():
-                drawings_queue.put(child)
-
-        glut.glutPostRedisplay()
+        with self.profiler.phase('animate'):
+            for drawing in scene.drawings:
+                drawing.save_state()
+                drawing.animation()
+                drawing.step_timer()
+            for system in scene.systems:
+                system()
 
     @staticmethod
     def create_texture(image: np.ndarray) -> int:
@@ -102,7 +123,7 @@ class Renderer:
         :return: Texture ID
         """
         texid = gl.glGenTextures(1)
-        gl.glBindTexture(gl.GL_TEXTURE_2D, texid)
+        GlState.bind_texture(texid)
         gl.glTexImage2D(gl.GL_TEXTURE_2D,
                         0,
                         gl.GL_RGBA,
@@ -117,8 +138,21 @@ class Renderer:
         gl.glTexParameterf(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST)
         gl.glTexParameterf(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR)
 
-        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
-        return texid
+        GlState.bind_texture(0)
+        # The texture is deleted when the last sprite using it is released
+        return GpuResources.add('texture', texid, image.shape[0] * image.shape[1] * 4)
+
+    @staticmethod
+    def read_image(filename: str) -> np.ndarray:
+        """
+        Decode image for a texture. It doesn't use OpenGL, so it can be called from any thread
+        :param filename: Path to image with the texture
+        :return: RGBA image
+        """
+        image = cv2.imread(filename, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            raise FileNotFoundError(f'Image {filename} can not be read')
+        return cv2.cvtColor(image, cv2.COLOR_RGBA2BGRA)
 
     @staticmethod
     def create_texture_from_file(filename: str) -> int:
@@ -127,9 +161,7 @@ class Renderer:
         :param filename: Path to image with the texture
         :return: Texture ID
         """
-        image = cv2.imread(filename, cv2.IMREAD_UNCHANGED)
-        image = cv2.cvtColor(image, cv2.COLOR_RGBA2BGRA)
-        return Renderer.create_texture(image)
+        return Renderer.create_texture(Renderer.read_image(filename))
 
     @staticmethod
     def create_shader(
@@ -137,19 +169,13 @@ class Renderer:
             source: str,
     ) -> int:
         """
-        Compile shader from string
+        Compile shader from string or load it from the cache of linked programs
         :param shader_type:  Type of shader
         :param source: Code of the shader represented by the string
         :return: Shader ID
         """
-        shader = gl.glCreateShader(shader_type)
-        gl.glShaderSource(shader, source)
-        gl.glCompileShader(shader)
-        result = gl.glGetShaderiv(shader, gl.GL_COMPILE_STATUS)
-        if not result:
-            raise RuntimeError(gl.glGetShaderInfoLog(shader))
-
-        shader_program = gl.glCreateProgram()
-        gl.glAttachShader(shader_program, shader)
-        gl.glLinkProgram(shader_program)
-        return shader_program
+        program = ShaderProgram([(shader_type, source)],
+                                # Sprite data is read from the same locations by all the shaders
+                                {'model': MODEL_LOCATION, 'sprite': SPRITE_LOCATION},
+                                Renderer.shader_cache_directory)
+        return program.id
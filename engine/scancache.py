@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import re
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+from engine.simplescanner import Cutout
+
+# Names of cache entries and their temporary files: digest of settings and hash of the photo
+ENTRY_NAME = re.compile(r'([0-9a-f]{16})-[0-9a-f]{32}\.npz(\.tmp)?')
+
+
+class ScanCache:
+    """
+    On-disk cache of scanned fish addressed by the content of the source photo
+    """
+
+    def __init__(
+            self,
+            directory: str,
+            settings: dict,
+            max_bytes: int = 512 * 1024 * 1024,
+    ):
+        """
+        Open the cache folder and drop entries created with other scanner settings. Other files in the folder
+        are left untouched
+        :param directory: Path to the folder with cached fish
+        :param settings: Settings of the scanner that affect the scanning result
+        :param max_bytes: Maximum size of the cache. The least recently used fish are removed above it
+        """
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._settings_digest = hashlib.blake2b(json.dumps(settings, sort_keys=True).encode(),
+                                                digest_size=8).hexdigest()
+
+        # Cached files in the order from the least to the most recently used
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+
+        os.makedirs(self._directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(self._directory):
+            match = ENTRY_NAME.fullmatch(entry.name)
+            if match is None or not entry.is_file():
+                # Not a file of the cache
+                continue
+            digest, temporary = match.groups()
+            if digest != self._settings_digest or temporary is not None:
+                # Scanner settings were changed or the entry was not written completely, so it is invalid
+                os.remove(entry.path)
+                continue
+            stat = entry.stat()
+            files.append((stat.st_mtime, entry.name, stat.st_size))
+
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total_bytes += size
+        self._evict()
+
+    def key(
+            self,
+            data: bytes,
+    ) -> str:
+        """
+        Compute key of the photo
+        :param data: Content of the photo file
+        :return: Key of the cache entry
+        """
+        return self._settings_digest + '-' + hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def __contains__(
+            self,
+            key: str,
+    ) -> bool:
+        """
+        Check if the photo is already in the cache
+        :param key: Key of the cache entry
+        :return: True if the entry exists
+        """
+        return key + '.npz' in self._entries
+
+    def get(
+            self,
+            key: str,
+    ) -> Optional[List[Cutout]]:
+        """
+        Load scanned fish from the cache
+        :param key: Key of the cache entry
+        :return: List of cached fish or None if there is no such entry
+        """
+        name = key + '.npz'
+        if name not in self._entries:
+            return None
+        path = os.path.join(self._directory, name)
+        try:
+            with np.load(path) as file:
+                cutouts = []
+                for i in range(len(file.files) // 2):
+                    x, y, w, h, sheet_w, sheet_h = file[f'rect_{i}'].tolist()
+                    cutouts.append(Cutout(file[f'image_{i}'], (x, y, w, h), (sheet_w, sheet_h)))
+        except (OSError, ValueError, KeyError):
+            # Entry was removed or damaged outside of the cache
+            self._forget(name)
+            return None
+        # Mark the entry as recently used
+        self._entries.move_to_end(name)
+        os.utime(path)
+        return cutouts
+
+    def put(
+            self,
+            key: str,
+            cutouts: List[Cutout],
+    ) -> None:
+        """
+        Store scanned fish in the cache
+        :param key: Key of the cache entry
+        :param cutouts: Scanned fish from one photo. Empty list if no fish was found
+        :return:
+        """
+        name = key + '.npz'
+        path = os.path.join(self._directory, name)
+        # Write to the temporary file first, so other processes never read a partial entry
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            # Images are stored without compression to load them as fast as possible
+            arrays = {}
+            for i, cutout in enumerate(cutouts):
+                arrays[f'image_{i}'] = cutout.image
+                arrays[f'rect_{i}'] = np.array(cutout.rect + cutout.sheet_size, np.int32)
+            np.savez(file, **arrays)
+        os.replace(temp_path, path)
+
+        self._forget(name)
+        size = os.path.getsize(path)
+        self._entries[name] = size
+        self._total_bytes += size
+        self._evict()
+
+    def _forget(
+            self,
+            name: str,
+    ) -> None:
+        """
+        Remove the entry from the index
+        :param name: Filename of the entry
+        :return:
+        """
+        size = self._entries.pop(name, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self) -> None:
+        """
+        Remove the least recently used entries while the cache is too big
+        :return:
+        """
+        while self._total_bytes > self._max_bytes and len(self._entries) > 0:
+            name, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(os.path.join(self._directory, name))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,108 @@
+import cv2
+import numpy as np
+
+
+class ScanWorkspace:
+    """
+    Preallocated buffers to remove background from images of the target size
+    """
+
+    def __init__(
+            self,
+            target_w: int,
+            target_h: int,
+            marker_size: int,
+    ):
+        """
+        Allocate all the buffers for the selected target size
+        :param target_w: Width of aligned images in pixels
+        :param target_h: Height of aligned images in pixels
+        :param marker_size: Size of markers in the corners of aligned images in pixels
+        """
+        self.target_w = target_w
+        self.target_h = target_h
+        self.marker_size = marker_size
+
+        # Stacks of aligned frames and their grayscale versions. They grow with the size of the batch
+        self._frames = np.empty((1, target_h, target_w, 3), np.uint8)
+        self._grays = np.empty((1, target_h, target_w), np.uint8)
+
+        self._mask = np.empty((target_h, target_w), np.uint8)
+        self._mask_filled = np.empty((target_h, target_w), np.uint8)
+        self._flood_mask = np.empty((target_h + 2, target_w + 2), np.uint8)
+        self._kernel = np.ones((5, 5), np.uint8)
+
+        # Areas of markers in the corners are drawn once and applied to every mask with a single operation
+        self._markers = np.zeros((target_h, target_w), np.uint8)
+        cv2.rectangle(self._markers, (0, 0), (marker_size, marker_size), 255, -1)
+        cv2.rectangle(self._markers, (target_w - marker_size, 0), (target_w, marker_size), 255, -1)
+        cv2.rectangle(self._markers, (target_w - marker_size, target_h - marker_size),
+                      (target_w, target_h), 255, -1)
+        cv2.rectangle(self._markers, (0, target_h - marker_size), (marker_size, target_h), 255, -1)
+
+    def fits(
+            self,
+            target_w: int,
+            target_h: int,
+            marker_size: int,
+    ) -> bool:
+        """
+        Check if the workspace was created for the same settings
+        :param target_w: Width of aligned images in pixels
+        :param target_h: Height of aligned images in pixels
+        :param marker_size: Size of markers in the corners of aligned images in pixels
+        :return: True if the workspace can be reused
+        """
+        return self.target_w == target_w and self.target_h == target_h and self.marker_size == marker_size
+
+    def frames(
+            self,
+            count: int,
+    ) -> np.ndarray:
+        """
+        Get buffer for a stack of aligned frames
+        :param count: Amount of frames in the stack
+        :return: Array of the shape (count, target_h, target_w, 3)
+        """
+        if self._frames.shape[0] < count:
+            self._frames = np.empty((count, self.target_h, self.target_w, 3), np.uint8)
+        return self._frames[:count]
+
+    def grays(
+            self,
+            count: int,
+    ) -> np.ndarray:
+        """
+        Get buffer for a stack of grayscale frames
+        :param count: Amount of frames in the stack
+        :return: Array of the shape (count, target_h, target_w)
+        """
+        if self._grays.shape[0] < count:
+            self._grays = np.empty((count, self.target_h, self.target_w), np.uint8)
+        return self._grays[:count]
+
+    def alpha(
+            self,
+            gray: np.ndarray,
+            threshold: int,
+    ) -> np.ndarray:
+        """
+        Build alpha channel that selects the fish from the white background
+        :param gray: Grayscale aligned frame
+        :param threshold: Brightness of the background
+        :return: Alpha channel. The buffer is overwritten by the next call
+        """
+        mask = self._mask
+        cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY, dst=mask)
+        cv2.morphologyEx(mask, cv2.MORPH_OPEN, self._kernel, dst=mask)
+
+        # Remove markers
+        np.bitwise_or(mask, self._markers, out=mask)
+
+        # Fill the background from the corner. Holes inside of the fish stay opaque
+        np.copyto(self._mask_filled, mask)
+        self._flood_mask.fill(0)
+        cv2.floodFill(self._mask_filled, self._flood_mask, (0, 0), 0)
+        np.bitwise_not(mask, out=mask)
+        np.add(self._mask_filled, mask, out=self._mask_filled)
+        return self._mask_filled
@@ -0,0 +1,158 @@
+from bisect import bisect_left
+from itertools import count
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from engine.drawing import Drawing
+
+
+class Scene:
+    """
+    Sprites of the scene with their child sprites in the order of drawing. The order is updated only for
+    added, removed and moved sprites. Changes of depth (position[2]) of a sprite in the scene aren't tracked,
+    so update() should be called after them, or EntityRegistry.set_depth() used
+    """
+
+    def __init__(self):
+        """
+        Create empty scene
+        """
+        # Sprites sorted by their keys
+        self._drawings: List[Drawing] = []
+        self._keys: List[Tuple[float, int, int, int]] = []
+        self._drawing_keys: Dict[Drawing, Tuple[float, int, int, int]] = {}
+        # Sprites added later are drawn later among the sprites with the same key
+        self._counter = count()
+        # Functions which animate many sprites at once
+        self._systems: List[Callable[[], None]] = []
+
+    def append(
+            self,
+            drawing: Drawing,
+    ) -> None:
+        """
+        Add the sprite and its child sprites to the scene. Child sprites are taken only at this moment
+        :param drawing: Sprite to add
+        :return:
+        """
+        self._insert(drawing, next(self._counter))
+        for child in drawing.get_child_sprites():
+            self.append(child)
+
+    def remove(
+            self,
+            drawing: Drawing,
+    ) -> None:
+        """
+        Remove the sprite and its child sprites from the scene
+        :param drawing: Sprite to remove
+        :return:
+        """
+        self._delete(drawing)
+        for child in drawing.get_child_sprites():
+            if child in self._drawing_keys:
+                self.remove(child)
+
+    def update(
+            self,
+            drawing: Drawing,
+    ) -> None:
+        """
+        Move the sprite to the new place in the order if its depth, shader or texture were changed.
+        It should be called after every such change, otherwise the sprite is drawn at its old place
+        :param drawing: Sprite of the scene
+        :return:
+        """
+        key = self._drawing_keys[drawing]
+        if key[:3] == self._sort_key(drawing):
+            return
+        self._delete(drawing)
+        self._insert(drawing, key[3])
+
+    def add_system(
+            self,
+            system: Callable[[], None],
+    ) -> None:
+        """
+        Add a function to call on every step of animation after the sprites were animated
+        :param system: Function which animates a group of sprites at once
+        :return:
+        """
+        self._systems.append(system)
+
+    @property
+    def systems(self) -> List[Callable[[], None]]:
+        """
+        :return: Functions to call on every step of animation
+        """
+        return self._systems
+
+    def __iter__(self) -> Iterator[Drawing]:
+        """
+        Iterate sprites in the order of drawing
+        :return: Iterator of sprites
+        """
+        return iter(self._drawings)
+
+    def __len__(self) -> int:
+        """
+        :return: Amount of sprites including child sprites
+        """
+        return len(self._drawings)
+
+    def __contains__(
+            self,
+            drawing: Drawing,
+    ) -> bool:
+        """
+        :param drawing: Sprite to find
+        :return: True if the sprite is in the scene
+        """
+        return drawing in self._drawing_keys
+
+    @property
+    def drawings(self) -> List[Drawing]:
+        """
+        :return: Sprites in the order of drawing. The list shouldn't be modified
+        """
+        return self._drawings
+
+    def _insert(
+            self,
+            drawing: Drawing,
+            order: int,
+    ) -> None:
+        """
+        Put the sprite to its place in the order
+        :param drawing: Sprite to insert
+        :param order: Number of the sprite among sprites with the same depth, shader and texture
+        :return:
+        """
+        key = self._sort_key(drawing) + (order,)
+        index = bisect_left(self._keys, key)
+        self._keys.insert(index, key)
+        self._drawings.insert(index, drawing)
+        self._drawing_keys[drawing] = key
+
+    def _delete(
+            self,
+            drawing: Drawing,
+    ) -> None:
+        """
+        Take the sprite out of the order
+        :param drawing: Sprite to delete
+        :return:
+        """
+        key = self._drawing_keys.pop(drawing)
+        index = bisect_left(self._keys, key)
+        del self._keys[index]
+        del self._drawings[index]
+
+    @staticmethod
+    def _sort_key(drawing: Drawing) -> Tuple[float, int, int]:
+        """
+        Sprites are blended, so they are drawn from back to front. Sprites at the same depth are grouped
+        by shader and texture to skip switching between them
+        :param drawing: Sprite
+        :return: Depth, shader and texture of the sprite
+        """
+        return float(drawing.position[2]), drawing.shader, drawing.texid
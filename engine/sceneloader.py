@@ -0,0 +1,84 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Type
+
+import OpenGL.GL as gl
+import numpy as np
+
+from engine.drawing import Drawing
+from engine.entityregistry import EntityRegistry
+from engine.renderer import Renderer
+
+
+class SceneLoader:
+    """
+    Create sprites from a scene file. Every texture is decoded and uploaded once however many sprites use it.
+
+    The file contains a list of layers. Values of a layer except its name and sprites are defaults for its
+    sprites. Every sprite has a type, a texture path and optionally position, rotate, scale, color, shader
+    and grid. Sprites of a layer are registered with the kind of the layer, 'static' by default
+    """
+
+    def __init__(
+            self,
+            sprite_types: Dict[str, Type[Drawing]],
+            shaders: Optional[Dict[str, str]] = None,
+            threads: Optional[int] = None,
+    ):
+        """
+        Setup types of sprites and shaders which can be used in scene files
+        :param sprite_types: Classes of sprites by their names in scene files
+        :param shaders: Code of vertex shaders by their names in scene files
+        :param threads: Amount of threads to decode images. Select None to select it by the amount of CPUs
+        """
+        self.sprite_types = sprite_types
+        self.shaders = shaders or {}
+        self.threads = threads
+
+    def load(
+            self,
+            path: str,
+            entities: EntityRegistry,
+    ) -> List[int]:
+        """
+        Create sprites of the scene file and add them to the registry in the order of the file
+        :param path: Path to the JSON scene file
+        :param entities: Registry to add sprites in it
+        :return: Handles of the added sprites
+        """
+        with open(path) as file:
+            layers = json.load(file)['layers']
+        sprites = []
+        for layer in layers:
+            defaults = {key: value for key, value in layer.items() if key not in ('name', 'sprites')}
+            sprites += [{**defaults, **sprite} for sprite in layer['sprites']]
+
+        textures = self._load_textures([sprite['texture'] for sprite in sprites])
+        shaders = {name: Renderer.create_shader(gl.GL_VERTEX_SHADER, self.shaders[name])
+                   for name in dict.fromkeys(sprite['shader'] for sprite in sprites if 'shader' in sprite)}
+
+        handles = []
+        for sprite in sprites:
+            grid_x, grid_y = sprite.get('grid', (5, 5))
+            drawing = self.sprite_types[sprite['type']](textures[sprite['texture']], grid_x, grid_y,
+                                                        shader=shaders.get(sprite.get('shader'), 0))
+            for name in ('position', 'rotate', 'scale', 'color'):
+                if name in sprite:
+                    setattr(drawing, name, np.array(sprite[name], np.float64))
+            handles.append(entities.add(drawing, sprite.get('kind', 'static')))
+        return handles
+
+    def _load_textures(
+            self,
+            paths: List[str],
+    ) -> Dict[str, int]:
+        """
+        Decode images in parallel and upload them after all of them are decoded
+        :param paths: Paths to images. Repeated paths are loaded once
+        :return: Texture IDs by paths
+        """
+        # Textures are created in the order of the first use, so the order of drawing doesn't depend on threads
+        unique_paths = list(dict.fromkeys(paths))
+        with ThreadPoolExecutor(self.threads) as executor:
+            images = list(executor.map(Renderer.read_image, unique_paths))
+        return {path: Renderer.create_texture(image) for path, image in zip(unique_paths, images)}
@@ -0,0 +1,160 @@
+import ctypes
+import hashlib
+import os
+from typing import Dict, List, Optional, Tuple
+
+import OpenGL.GL as gl
+import numpy as np
+from OpenGL.error import GLError
+
+
+class ShaderProgram:
+    """
+    Linked shader program. Linked binaries can be kept on disk to skip compilation
+    """
+
+    def __init__(
+            self,
+            sources: List[Tuple[gl.Constant, str]],
+            attributes: Optional[Dict[str, int]] = None,
+            cache_directory: Optional[str] = None,
+    ):
+        """
+        Load the program from the cache or compile and link it
+        :param sources: Types and codes of shaders
+        :param attributes: Locations of attributes by their names
+        :param cache_directory: Folder to keep linked programs. Select None to compile every time
+        """
+        self.id = gl.glCreateProgram()
+        attributes = attributes or {}
+
+        path = None
+        if cache_directory is not None and self.binaries_supported():
+            path = os.path.join(cache_directory, self._cache_key(sources, attributes) + '.bin')
+        self.from_cache = path is not None and self._load_binary(path)
+        if not self.from_cache:
+            self._compile(sources, attributes, retrievable=path is not None)
+            if path is not None:
+                self._save_binary(path)
+
+    @staticmethod
+    def binaries_supported() -> bool:
+        """
+        Check if the driver can save and load linked programs
+        :return: True if program binaries are supported
+        """
+        return bool(gl.glProgramBinary) and gl.glGetIntegerv(gl.GL_NUM_PROGRAM_BINARY_FORMATS) > 0
+
+    def _compile(
+            self,
+            sources: List[Tuple[gl.Constant, str]],
+            attributes: Dict[str, int],
+            retrievable: bool,
+    ) -> None:
+        """
+        Compile shaders and link them into the program
+        :param sources: Types and codes of shaders
+        :param attributes: Locations of attributes by their names
+        :param retrievable: Ask the driver to keep the linked binary
+        :return:
+        """
+        shaders = []
+        for shader_type, source in sources:
+            shader = gl.glCreateShader(shader_type)
+            gl.glShaderSource(shader, source)
+            gl.glCompileShader(shader)
+            if not gl.glGetShaderiv(shader, gl.GL_COMPILE_STATUS):
+                raise RuntimeError(gl.glGetShaderInfoLog(shader))
+            gl.glAttachShader(self.id, shader)
+            shaders.append(shader)
+
+        for name, location in attributes.items():
+            gl.glBindAttribLocation(self.id, location, name)
+        if retrievable:
+            gl.glProgramParameteri(self.id, gl.GL_PROGRAM_BINARY_RETRIEVABLE_HINT, gl.GL_TRUE)
+        gl.glLinkProgram(self.id)
+
+        # Shaders are not needed after linking
+        for shader in shaders:
+            gl.glDetachShader(self.id, shader)
+            gl.glDeleteShader(shader)
+        if not gl.glGetProgramiv(self.id, gl.GL_LINK_STATUS):
+            raise RuntimeError(gl.glGetProgramInfoLog(self.id))
+
+    def _load_binary(
+            self,
+            path: str,
+    ) -> bool:
+        """
+        Load linked program from the file
+        :param path: Path to the file with the program
+        :return: True if the program is loaded
+        """
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return False
+        if len(data) <= 4:
+            return False
+
+        binary_format = int.from_bytes(data[:4], 'little')
+        binary = np.frombuffer(data, np.uint8, offset=4)
+        try:
+            gl.glProgramBinary(self.id, binary_format, binary.ctypes.data_as(ctypes.c_void_p), binary.size)
+            if gl.glGetProgramiv(self.id, gl.GL_LINK_STATUS):
+                return True
+        except GLError:
+            # Format of the binary is unknown to the driver
+            pass
+
+        # The driver rejected the binary, start from a clean program
+        gl.glDeleteProgram(self.id)
+        self.id = gl.glCreateProgram()
+        return False
+
+    def _save_binary(
+            self,
+            path: str,
+    ) -> None:
+        """
+        Save linked program to the file
+        :param path: Path to the file with the program
+        :return:
+        """
+        length = gl.glGetProgramiv(self.id, gl.GL_PROGRAM_BINARY_LENGTH)
+        if length <= 0:
+            return
+        binary = np.empty(length, np.uint8)
+        written = gl.GLsizei()
+        binary_format = gl.GLenum()
+        gl.glGetProgramBinary(self.id, length, ctypes.byref(written), ctypes.byref(binary_format),
+                              binary.ctypes.data_as(ctypes.c_void_p))
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to the temporary file first, so other processes never read a partial program
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(int(binary_format.value).to_bytes(4, 'little'))
+            file.write(binary[:written.value].tobytes())
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def _cache_key(
+            sources: List[Tuple[gl.Constant, str]],
+            attributes: Dict[str, int],
+    ) -> str:
+        """
+        Compute key of the program. Binaries can't be used with other drivers, so the driver is a part of the key
+        :param sources: Types and codes of shaders
+        :param attributes: Locations of attributes by their names
+        :return: Key of the cache entry
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for name in (gl.GL_VENDOR, gl.GL_RENDERER, gl.GL_VERSION):
+            digest.update(gl.glGetString(name) + b'\0')
+        for shader_type, source in sources:
+            digest.update(f'{int(shader_type)}\0{source}\0'.encode())
+        for name, location in sorted(attributes.items()):
+            digest.update(f'{name}={location}\0'.encode())
+        return digest.hexdigest()
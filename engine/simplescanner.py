@@ -1,6 +1,37 @@
+from threading import Lock
+from typing import List, NamedTuple, Sequence, Tuple
+
 import cv2
 import numpy as np
 
+from engine.scanworkspace import ScanWorkspace
+
+# IDs of markers in the corners of sheets in the order: top left, top right, bottom right, bottom left.
+# The first sheet is printed in ./ocean/patterns, the others use the rest of the DICT_4X4_50 dictionary
+# and are drawn by generate_sheets.py
+DEFAULT_SHEETS = [(3, 1, 2, 4)] + [(i, i + 1, i + 2, i + 3) for i in range(5, 49, 4)]
+
+
+class Cutout(NamedTuple):
+    """
+    Image of a fish cut from the aligned sheet
+    """
+    # Image with alpha channel
+    image: np.ndarray
+    # Position of the image on the aligned sheet: x, y, width, height in pixels
+    rect: Tuple[int, int, int, int]
+    # Size of the aligned sheet: width, height in pixels
+    sheet_size: Tuple[int, int]
+
+    def relative_rect(self) -> Tuple[float, float, float, float]:
+        """
+        Get position of the image as parts of the sheet size
+        :return: x, y, width, height relative to the sheet
+        """
+        sheet_w, sheet_h = self.sheet_size
+        x, y, w, h = self.rect
+        return x / sheet_w, y / sheet_h, w / sheet_w, h / sheet_h
+
 
 class SimpleScanner:
     """
@@ -14,15 +45,73 @@ class SimpleScanner:
         self._aruco_dict = cv2.aruco.Dictionary_get(cv2.aruco.DICT_4X4_50)
         self._aruco_params = cv2.aruco.DetectorParameters_create()
 
-        self._marker_top_left_id = 3
-        self._marker_top_right_id = 1
-        self._marker_bottom_left_id = 4
-        self._marker_bottom_right_id = 2
+        # IDs of markers of every sheet kind that can be scanned
+        self.sheets = list(DEFAULT_SHEETS)
 
         # Target size of scanned image in pixels
         self.target_w = 800
         self.target_h = 600
 
+        # Level of the image pyramid to search markers on. Select 0 to search on the full resolution
+        self.pyramid_level = 1
+
+        # Settings of the background removal
+        self.brightness_alpha = 1.2
+        self.brightness_beta = 10
+        self.threshold = 130
+        self.marker_size = 130
+
+        # Settings of trimming transparent borders of the fish. Select max_texture_size 0 to keep the resolution
+        self.crop_to_content = False
+        self.crop_padding = 8
+        self.max_texture_size = 0
+
+        # Buffers reused by every scan. The lock protects them from concurrent scans
+        self._workspace = None
+        self._lock = Lock()
+
+    def settings(self) -> dict:
+        """
+        Collect all the settings that affect the scanning result
+        :return: Dictionary with the settings
+        """
+        return {
+            'target_w': self.target_w,
+            'target_h': self.target_h,
+            'brightness_alpha': self.brightness_alpha,
+            'brightness_beta': self.brightness_beta,
+            'threshold': self.threshold,
+            'marker_size': self.marker_size,
+            'pyramid_level': self.pyramid_level,
+            'sheets': [list(sheet) for sheet in self.sheets],
+            'crop_to_content': self.crop_to_content,
+            'crop_padding': self.crop_padding,
+            'max_texture_size': self.max_texture_size,
+        }
+
+    def __getstate__(self) -> dict:
+        """
+        Drop OpenCV objects that can not be pickled, so the scanner can be sent to worker processes
+        :return: State of the scanner
+        """
+        state = self.__dict__.copy()
+        del state['_aruco_dict']
+        del state['_aruco_params']
+        del state['_lock']
+        state['_workspace'] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """
+        Restore the scanner and recreate AR markers detector
+        :param state: State of the scanner
+        :return:
+        """
+        self.__dict__.update(state)
+        self._aruco_dict = cv2.aruco.Dictionary_get(cv2.aruco.DICT_4X4_50)
+        self._aruco_params = cv2.aruco.DetectorParameters_create()
+        self._lock = Lock()
+
     def scan(
             self,
             frame: np.ndarray,
@@ -32,51 +121,199 @@ class SimpleScanner:
         :param frame: Photo of a fish from an opencv image
         :return: Aligned image of a fish
         """
+        tl, tr, br, bl = self._locate_sheet(frame)
+
+        widthA = np.sqrt(((br[0] - bl[0]) ** 2) + ((br[1] - bl[1]) ** 2))
+        widthB = np.sqrt(((tr[0] - tl[0]) ** 2) + ((tr[1] - tl[1]) ** 2))
+        maxWidth = max(int(widthA), int(widthB))
+
+        heightA = np.sqrt(((tr[0] - br[0]) ** 2) + ((tr[1] - br[1]) ** 2))
+        heightB = np.sqrt(((tl[0] - bl[0]) ** 2) + ((tl[1] - bl[1]) ** 2))
+        maxHeight = max(int(heightA), int(heightB))
+
+        dst = np.array([
+            [0, 0],
+            [maxWidth - 1, 0],
+            [maxWidth - 1, maxHeight - 1],
+            [0, maxHeight - 1]], dtype="float32")
+
+        rect = np.array((tl, tr, br, bl)).astype("float32")
+        M = cv2.getPerspectiveTransform(rect, dst)
+        warped = cv2.warpPerspective(frame, M, (maxWidth, maxHeight))
+
+        return warped
+
+    def _locate_sheet(
+            self,
+            frame: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Find corners of the first sheet in the frame
+        :param frame: Photo of a fish from an opencv image
+        :return: Array of top left, top right, bottom right and bottom left corners
+        """
+        rects = self._locate_sheets(frame)
+        if len(rects) == 0:
+            raise ValueError("Markers in the image are not found")
+        return rects[0]
+
+    def _locate_sheets(
+            self,
+            frame: np.ndarray,
+    ) -> List[np.ndarray]:
+        """
+        Find corners of all the sheets in the frame. Markers are searched on the reduced image first
+        and only the corners of the sheets are refined on the full resolution
+        :param frame: Photo of a fish from an opencv image
+        :return: List of arrays of top left, top right, bottom right and bottom left corners
+        """
+        if self.pyramid_level > 0:
+            small_frame = frame
+            for _ in range(self.pyramid_level):
+                small_frame = cv2.pyrDown(small_frame)
+            rects, incomplete, repeated = self._find_sheets_corners(small_frame)
+            if len(rects) > 0 and not incomplete:
+                self._report_repeated(repeated)
+                # Convert pixel centers from the reduced image to the full resolution
+                scale = 2 ** self.pyramid_level
+                return [self._refine_corners(frame, (rect + 0.5) * scale - 0.5) for rect in rects]
+
+        # Some markers are too small for the reduced image, so search them on the full resolution
+        rects, _, repeated = self._find_sheets_corners(frame)
+        self._report_repeated(repeated)
+        return rects
+
+    def _find_sheets_corners(
+            self,
+            frame: np.ndarray,
+    ) -> Tuple[List[np.ndarray], bool, List[Tuple[int, ...]]]:
+        """
+        Detect all the markers at once and group them into sheets
+        :param frame: Photo of a fish from an opencv image
+        :return: List of arrays of top left, top right, bottom right and bottom left corners,
+                 True if some sheets are found only partially and markers of skipped sheets which are
+                 found more than once
+        """
         corners, ids, rejected = cv2.aruco.detectMarkers(frame, self._aruco_dict,
                                                          parameters=self._aruco_params)
 
-        top_left, top_right, bottom_right, bottom_left = None, None, None, None
-
+        # All the detections of every ID
+        markers = {}
         if len(corners) > 0:
-            ids = ids.flatten()
-            for (marker_corner, marker_id) in zip(corners, ids):
-                corners = marker_corner.reshape((4, 2))
-                if marker_id == self._marker_top_left_id:
-                    top_left, _, _, _ = corners
-                elif marker_id == self._marker_top_right_id:
-                    _, top_right, _, _ = corners
-                elif marker_id == self._marker_bottom_right_id:
-                    _, _, bottom_right, _ = corners
-                elif marker_id == self._marker_bottom_left_id:
-                    _, _, _, bottom_left = corners
-
-        if (top_left is None) or (top_right is None) or (bottom_right is None) or (bottom_left is None):
-            raise ValueError("Markers in the image are not found")
-        else:
-            tr = (int(top_right[0]), int(top_right[1]))
-            br = (int(bottom_right[0]), int(bottom_right[1]))
-            bl = (int(bottom_left[0]), int(bottom_left[1]))
-            tl = (int(top_left[0]), int(top_left[1]))
+            for (marker_corner, marker_id) in zip(corners, ids.flatten()):
+                markers.setdefault(int(marker_id), []).append(marker_corner.reshape((4, 2)))
+
+        rects = []
+        incomplete = False
+        repeated = []
+        for sheet in self.sheets:
+            found = [marker_id in markers for marker_id in sheet]
+            if all(found):
+                if any(len(markers[marker_id]) > 1 for marker_id in sheet):
+                    # Several sheets with the same markers can't be told apart, corners would be mixed up
+                    repeated.append(tuple(sheet))
+                    continue
+                # Take the outer corner of every marker
+                rect = [markers[marker_id][0][i] for i, marker_id in enumerate(sheet)]
+                rects.append(np.array(rect, dtype=np.float32))
+            elif any(found):
+                incomplete = True
+        return rects, incomplete, repeated
+
+    @staticmethod
+    def _report_repeated(repeated: List[Tuple[int, ...]]) -> None:
+        """
+        Report sheets which are skipped because their markers are found more than once
+        :param repeated: Markers of the skipped sheets
+        :return:
+        """
+        for sheet in repeated:
+            print(f'Markers {sheet} are found on several sheets, print these sheets with other markers')
+
+    def _refine_corners(
+            self,
+            frame: np.ndarray,
+            rect: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Refine corners of the sheet with sub-pixel accuracy in small regions of the full resolution image
+        :param frame: Photo of a fish from an opencv image
+        :param rect: Approximate corners of the sheet
+        :return: Refined corners of the sheet
+        """
+        # Search window should cover the error of coordinates from the reduced image
+        window = 3 * 2 ** self.pyramid_level + 1
+        border = 2 * window + 1
+        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.01)
+        height, width = frame.shape[:2]
 
-            widthA = np.sqrt(((br[0] - bl[0]) ** 2) + ((br[1] - bl[1]) ** 2))
-            widthB = np.sqrt(((tr[0] - tl[0]) ** 2) + ((tr[1] - tl[1]) ** 2))
-            maxWidth = max(int(widthA), int(widthB))
+        refined_rect = rect.copy()
+        for i, (x, y) in enumerate(rect):
+            x0 = max(int(round(x)) - border, 0)
+            y0 = max(int(round(y)) - border, 0)
+            x1 = min(int(round(x)) + border + 1, width)
+            y1 = min(int(round(y)) + border + 1, height)
+            roi = frame[y0:y1, x0:x1]
+            if roi.ndim == 3:
+                roi = cv2.cvtColor(roi, cv2.COLOR_RGB2GRAY)
+            if roi.shape[0] <= 2 * window + 2 or roi.shape[1] <= 2 * window + 2:
+                # Corner is too close to the border of the image
+                continue
+            corner = np.array([[[x - x0, y - y0]]], dtype=np.float32)
+            cv2.cornerSubPix(roi, corner, (window, window), (-1, -1), criteria)
+            refined_rect[i] = corner[0, 0] + (x0, y0)
+        return refined_rect
 
-            heightA = np.sqrt(((tr[0] - br[0]) ** 2) + ((tr[1] - br[1]) ** 2))
-            heightB = np.sqrt(((tl[0] - bl[0]) ** 2) + ((tl[1] - bl[1]) ** 2))
-            maxHeight = max(int(heightA), int(heightB))
+    def scan_cutout(
+            self,
+            frame: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Scan fish and remove background in one pass. The sheet is warped straight to the target size
+        :param frame: Photo of a fish from an opencv image
+        :return: OpenCV image with alpha channel
+        """
+        rect = self._locate_sheet(frame)
+        return self._warp_cutouts(frame, [rect])[0]
 
-            dst = np.array([
-                [0, 0],
-                [maxWidth - 1, 0],
-                [maxWidth - 1, maxHeight - 1],
-                [0, maxHeight - 1]], dtype="float32")
+    def scan_many(
+            self,
+            frame: np.ndarray,
+    ) -> List[np.ndarray]:
+        """
+        Scan all the sheets visible in the frame and remove background from them
+        :param frame: Photo of fish from an opencv image
+        :return: List of OpenCV images with alpha channel. It is empty if no sheet is found
+        """
+        rects = self._locate_sheets(frame)
+        if len(rects) == 0:
+            return []
+        return list(self._warp_cutouts(frame, rects))
 
-            rect = np.array((tl, tr, br, bl)).astype("float32")
-            M = cv2.getPerspectiveTransform(rect, dst)
-            warped = cv2.warpPerspective(frame, M, (maxWidth, maxHeight))
+    def _warp_cutouts(
+            self,
+            frame: np.ndarray,
+            rects: List[np.ndarray],
+    ) -> np.ndarray:
+        """
+        Warp sheets straight to the target size and remove background from them
+        :param frame: Photo of fish from an opencv image
+        :param rects: Corners of the sheets
+        :return: Stack of OpenCV images with alpha channel
+        """
+        dst = np.array([
+            [0, 0],
+            [self.target_w - 1, 0],
+            [self.target_w - 1, self.target_h - 1],
+            [0, self.target_h - 1]], dtype="float32")
 
-            return warped
+        with self._lock:
+            workspace = self._get_workspace()
+            warped = workspace.frames(len(rects))
+            for rect, warped_frame in zip(rects, warped):
+                M = cv2.getPerspectiveTransform(rect, dst)
+                cv2.warpPerspective(frame, M, (self.target_w, self.target_h), dst=warped_frame)
+            return self._cut_background(workspace, warped)
 
     def remove_background(
             self,
@@ -87,33 +324,88 @@ class SimpleScanner:
         :param frame: Aligned image of a fish
         :return: OpenCV image with alpha channel
         """
-        frame = cv2.resize(frame, (self.target_w, self.target_h))
+        return self.remove_background_many([frame])[0]
 
-        # TODO: remove this fix for final version
-        frame = cv2.convertScaleAbs(frame, alpha=1.2, beta=10)
+    def trim(
+            self,
+            image: np.ndarray,
+    ) -> Cutout:
+        """
+        Crop transparent borders of the fish image and reduce it to the maximum texture size
+        :param image: OpenCV image with alpha channel
+        :return: Cropped image with its position on the sheet
+        """
+        height, width = image.shape[:2]
+        x0, y0, x1, y1 = 0, 0, width, height
+        if self.crop_to_content:
+            x, y, w, h = cv2.boundingRect(np.ascontiguousarray(image[..., 3]))
+            if w > 0 and h > 0:
+                x0 = max(x - self.crop_padding, 0)
+                y0 = max(y - self.crop_padding, 0)
+                x1 = min(x + w + self.crop_padding, width)
+                y1 = min(y + h + self.crop_padding, height)
+        cropped = image[y0:y1, x0:x1]
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
-        ret, mask = cv2.threshold(gray, 130, 255, cv2.THRESH_BINARY)
-        kernel = np.ones((5, 5), np.uint8)
-        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+        crop_w, crop_h = x1 - x0, y1 - y0
+        if 0 < self.max_texture_size < max(crop_w, crop_h):
+            scale = self.max_texture_size / max(crop_w, crop_h)
+            size = (max(int(round(crop_w * scale)), 1), max(int(round(crop_h * scale)), 1))
+            cropped = cv2.resize(cropped, size, interpolation=cv2.INTER_AREA)
+        else:
+            # Copy the crop, so the full image is not kept in memory
+            cropped = np.ascontiguousarray(cropped)
+        return Cutout(cropped, (x0, y0, crop_w, crop_h), (width, height))
 
-        # Remove markers
-        marker_size = 130
-        mask = cv2.rectangle(mask, (0, 0), (marker_size, marker_size), 255, -1)
-        mask = cv2.rectangle(mask, (self.target_w - marker_size, 0), (self.target_w, marker_size), 255, -1)
-        mask = cv2.rectangle(mask, (self.target_w - marker_size, self.target_h - marker_size),
-                             (self.target_w, self.target_h), 255, -1)
-        mask = cv2.rectangle(mask, (0, self.target_h - marker_size), (marker_size, self.target_h), 255, -1)
+    def remove_background_many(
+            self,
+            frames: Sequence[np.ndarray],
+    ) -> np.ndarray:
+        """
+        Remove background from many fish images with the same set of buffers
+        :param frames: Aligned images of fish. They can be a list or a stack in one array
+        :return: Stack of OpenCV images with alpha channel of the shape (len(frames), target_h, target_w, 4)
+        """
+        with self._lock:
+            workspace = self._get_workspace()
+            resized = workspace.frames(len(frames))
+            for frame, resized_frame in zip(frames, resized):
+                cv2.resize(frame, (self.target_w, self.target_h), dst=resized_frame)
+            return self._cut_background(workspace, resized)
 
-        mask_filled = mask.copy()
-        cv2.floodFill(mask_filled, np.zeros((self.target_h + 2, self.target_w + 2), np.uint8), (0, 0), 0)
-        mask_filled += 255 - mask
+    def _get_workspace(self) -> ScanWorkspace:
+        """
+        Get workspace with buffers. It is created again only when the target size is changed
+        :return: Workspace for the current settings
+        """
+        if self._workspace is None or not self._workspace.fits(self.target_w, self.target_h, self.marker_size):
+            self._workspace = ScanWorkspace(self.target_w, self.target_h, self.marker_size)
+        return self._workspace
 
-        filtered_frame = cv2.cvtColor(frame, cv2.COLOR_RGB2RGBA)
-        filtered_frame[..., 3] = mask_filled
+    def _cut_background(
+            self,
+            workspace: ScanWorkspace,
+            frames: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Remove background from the stack of fish images of the target size. Frames are modified in place
+        :param workspace: Workspace with buffers
+        :param frames: Stack of aligned images of fish
+        :return: Stack of OpenCV images with alpha channel
+        """
+        # Process the whole stack as one tall image
+        count = frames.shape[0]
+        flat_frames = frames.reshape(count * self.target_h, self.target_w, 3)
+        # TODO: remove this fix for final version
+        cv2.convertScaleAbs(flat_frames, dst=flat_frames, alpha=self.brightness_alpha, beta=self.brightness_beta)
+        grays = workspace.grays(count)
+        cv2.cvtColor(flat_frames, cv2.COLOR_RGB2GRAY, dst=grays.reshape(count * self.target_h, self.target_w))
 
-        return filtered_frame
+        filtered_frames = np.empty((count, self.target_h, self.target_w, 4), np.uint8)
+        for frame, gray, filtered_frame in zip(frames, grays, filtered_frames):
+            cv2.cvtColor(frame, cv2.COLOR_RGB2RGBA, dst=filtered_frame)
+            filtered_frame[..., 3] = workspace.alpha(gray, self.threshold)
 
+        return filtered_frames
 
 '''
 if __name__ == '__main__':
@@ -0,0 +1,60 @@
+import numpy as np
+
+
+class SpatialHash:
+    """
+    Uniform grid to gather values of close points. Values are summed per cell, then per block of 3x3 cells,
+    so the whole query takes linear time in the amount of points and cells however dense the points are
+    """
+
+    def __init__(
+            self,
+            cell_size: float,
+    ):
+        """
+        Setup size of the grid
+        :param cell_size: Size of grid cells. Points closer than it are always neighbours
+        """
+        self.cell_size = cell_size
+        self._shape = (0, 0)
+        self._keys = np.zeros(0, np.int64)
+
+    def build(
+            self,
+            positions: np.ndarray,
+    ) -> None:
+        """
+        Put points to cells of the grid. Grid covers only the area with the points
+        :param positions: Coordinates of points (N, 2)
+        :return:
+        """
+        if len(positions) == 0:
+            self._shape = (0, 0)
+            self._keys = np.zeros(0, np.int64)
+            return
+        cells = np.floor(positions / self.cell_size).astype(np.int64)
+        cells -= cells.min(axis=0)
+        # Empty cells around the grid to sum blocks at the edges the same way
+        self._shape = (cells[:, 1].max() + 3, cells[:, 0].max() + 3)
+        self._keys = (cells[:, 1] + 1) * self._shape[1] + cells[:, 0] + 1
+
+    def neighbour_sums(
+            self,
+            values: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Sum values of the points in the cell of every point and in the cells around it. The point itself
+        is included
+        :param values: Values of the points from the last build (N, K)
+        :return: Sums for every point (N, K)
+        """
+        height, width = self._shape
+        sums = np.zeros_like(values, np.float64)
+        for k in range(values.shape[1]):
+            grid = np.bincount(self._keys, values[:, k], height * width).reshape(height, width)
+            block = np.zeros_like(grid)
+            for dy in (-1, 0, 1):
+                for dx in (-1, 0, 1):
+                    block[1:-1, 1:-1] += grid[1 + dy:height - 1 + dy, 1 + dx:width - 1 + dx]
+            sums[:, k] = block.ravel()[self._keys]
+        return sums
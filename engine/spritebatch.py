@@ -0,0 +1,198 @@
+from typing import Dict, List
+
+import OpenGL.GL as gl
+import numpy as np
+
+from engine.drawing import Drawing, MODEL_LOCATION, SPRITE_LOCATION
+from engine.glstate import GlState
+from engine.gpuresources import GpuResources
+from engine.mesh import Mesh
+
+# Floats per sprite in the buffer: model matrix by columns, color and timer
+SPRITE_FLOATS = 20
+
+
+class SpriteBatch:
+    """
+    Draw sprites with model matrices computed at once and uploaded in one buffer
+    """
+
+    def __init__(
+            self,
+            default_shader: int,
+    ):
+        """
+        Create buffer for data of the sprites
+        :param default_shader: ID of shader compiled from SPRITE_SHADER_CODE for sprites without own shader
+        """
+        self._default_shader = default_shader
+        self._buffer = GpuResources.add('buffer', gl.glGenBuffers(1))
+        GpuResources.retain('buffer', self._buffer)
+        # Vertex arrays which read the buffer of the batch by the mesh
+        self._vaos: Dict[Mesh, int] = {}
+        # Drawing with the base instance needs OpenGL 4.2
+        self._base_instance = bool(gl.glDrawElementsInstancedBaseInstance)
+
+    def render(
+            self,
+            drawings_list: List[Drawing],
+            alpha: float = 1.0,
+    ) -> None:
+        """
+        Draw sprites in the order of the list
+        :param drawings_list: Sorted list of sprites to draw
+        :param alpha: Part of the time between the previous and the last step of animation to draw sprites at
+        :return:
+        """
+        batched = [drawing for drawing in drawings_list if drawing.batched]
+        data = self._sprites_data(batched, alpha)
+        if self._base_instance and len(batched) > 0:
+            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self._buffer)
+            # Buffer is allocated again every frame, so the driver doesn't wait for the previous frame
+            gl.glBufferData(gl.GL_ARRAY_BUFFER, data.nbytes, data, gl.GL_STREAM_DRAW)
+            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+            GpuResources.resize('buffer', self._buffer, data.nbytes)
+
+        index = 0
+        position = 0
+        while position < len(drawings_list):
+            drawing = drawings_list[position]
+            if not drawing.batched:
+                drawing.render(alpha)
+                position += 1
+                continue
+
+            GlState.bind_texture(drawing.texid)
+            GlState.use_program(drawing.shader if drawing.shader != 0 else self._default_shader)
+            mesh = drawing.mesh
+            if self._base_instance:
+                # Every sprite is an instance of the mesh taking its own row of the buffer. Following sprites
+                # with the same texture, shader and mesh are drawn by the same call
+                count = 1
+                while (position + count < len(drawings_list)
+                       and self._same_state(drawing, drawings_list[position + count])):
+                    count += 1
+                GlState.bind_vertex_array(self._get_vao(mesh))
+                gl.glDrawElementsInstancedBaseInstance(gl.GL_TRIANGLES, mesh.indices_count, gl.GL_UNSIGNED_INT,
+                                                       None, count, index)
+                GlState.count_draw_call()
+            else:
+                count = 1
+                GlState.bind_vertex_array(mesh.vao)
+                for column in range(4):
+                    gl.glVertexAttrib4fv(MODEL_LOCATION + column, data[index, column * 4:column * 4 + 4])
+                gl.glVertexAttrib4fv(SPRITE_LOCATION, data[index, 16:])
+                mesh.draw()
+            index += count
+            position += count
+
+    @staticmethod
+    def _same_state(
+            drawing: Drawing,
+            other: Drawing,
+    ) -> bool:
+        """
+        Check if two sprites can be drawn by one draw call
+        :param drawing: Sprite
+        :param other: Sprite drawn after it
+        :return: True if the sprites have the same texture, shader and mesh
+        """
+        return (other.batched and other.texid == drawing.texid and other.shader == drawing.shader
+                and other.mesh is drawing.mesh)
+
+    def _get_vao(self, mesh: Mesh) -> int:
+        """
+        Get vertex array which reads vertices from the mesh and data of sprites from the buffer of the batch
+        :param mesh: Mesh of sprites
+        :return: ID of vertex array
+        """
+        vao = self._vaos.get(mesh)
+        if vao is not None:
+            return vao
+
+        vao = GpuResources.add('vertex_array', gl.glGenVertexArrays(1))
+        GpuResources.retain('vertex_array', vao)
+        GlState.bind_vertex_array(vao)
+        mesh.bind_attributes()
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self._buffer)
+        stride = SPRITE_FLOATS * 4
+        for column in range(4):
+            gl.glEnableVertexAttribArray(MODEL_LOCATION + column)
+            gl.glVertexAttribPointer(MODEL_LOCATION + column, 4, gl.GL_FLOAT, gl.GL_FALSE, stride,
+                                     gl.GLvoidp(column * 16))
+            gl.glVertexAttribDivisor(MODEL_LOCATION + column, 1)
+        gl.glEnableVertexAttribArray(SPRITE_LOCATION)
+        gl.glVertexAttribPointer(SPRITE_LOCATION, 4, gl.GL_FLOAT, gl.GL_FALSE, stride, gl.GLvoidp(64))
+        gl.glVertexAttribDivisor(SPRITE_LOCATION, 1)
+        GlState.bind_vertex_array(0)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+
+        self._vaos[mesh] = vao
+        return vao
+
+    @staticmethod
+    def _sprites_data(
+            drawings_list: List[Drawing],
+            alpha: float = 1.0,
+    ) -> np.ndarray:
+        """
+        Collect model matrices, colors and animation timers of the sprites
+        :param drawings_list: List of sprites
+        :param alpha: Part of the time between the previous and the last step of animation to draw sprites at
+        :return: Array with a row of SPRITE_FLOATS values for every sprite
+        """
+        data = np.empty((len(drawings_list), SPRITE_FLOATS), np.float32)
+        if len(drawings_list) == 0:
+            return data
+        # Position, rotation and scale of every sprite (N, 3, 3)
+        states = np.array([(drawing.position, drawing.rotate, drawing.scale) for drawing in drawings_list])
+        if alpha < 1.0:
+            # Sprites added after the last step have no previous state
+            previous = np.array([drawing.previous_state if drawing.previous_state is not None else state
+                                 for drawing, state in zip(drawings_list, states)])
+            difference = states - previous
+            # Rotate by the shortest way when the angle crosses 360 degrees
+            difference[:, 1] = (difference[:, 1] + 180) % 360 - 180
+            states = previous + difference * alpha
+
+        matrices = SpriteBatch.model_matrices(states[:, 0], states[:, 1], states[:, 2])
+        # OpenGL reads matrices by columns
+        data[:, :16] = matrices.transpose(0, 2, 1).reshape(-1, 16)
+        data[:, 16:19] = [drawing.color for drawing in drawings_list]
+        data[:, 19] = [drawing.timer for drawing in drawings_list]
+        return data
+
+    @staticmethod
+    def model_matrices(
+            positions: np.ndarray,
+            rotates: np.ndarray,
+            scales: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Compute model matrices like glTranslate, glRotate around X, Y, Z and glScale applied in this order
+        :param positions: Positions of sprites (N, 3)
+        :param rotates: Angles of rotation around axes X, Y and Z in degrees (N, 3)
+        :param scales: Scales of sprites along axes (N, 3)
+        :return: Model matrices (N, 4, 4)
+        """
+        angles = np.radians(rotates)
+        cos, sin = np.cos(angles), np.sin(angles)
+        count = len(positions)
+        ones, zeros = np.ones(count), np.zeros(count)
+
+        rotate_x = np.stack([ones, zeros, zeros,
+                             zeros, cos[:, 0], -sin[:, 0],
+                             zeros, sin[:, 0], cos[:, 0]], axis=1).reshape(-1, 3, 3)
+        rotate_y = np.stack([cos[:, 1], zeros, sin[:, 1],
+                             zeros, ones, zeros,
+                             -sin[:, 1], zeros, cos[:, 1]], axis=1).reshape(-1, 3, 3)
+        rotate_z = np.stack([cos[:, 2], -sin[:, 2], zeros,
+                             sin[:, 2], cos[:, 2], zeros,
+                             zeros, zeros, ones], axis=1).reshape(-1, 3, 3)
+
+        matrices = np.zeros((count, 4, 4), np.float32)
+        matrices[:, :3, :3] = rotate_x @ rotate_y @ rotate_z * scales[:, None, :]
+        matrices[:, :3, 3] = positions
+        matrices[:, 3, 3] = 1
+        return matrices
+
@@ -0,0 +1,177 @@
+import ctypes
+from collections import deque
+from typing import Callable, Deque, List, Tuple
+
+import OpenGL.GL as gl
+import numpy as np
+
+from engine.glstate import GlState
+from engine.gpuresources import GpuResources
+
+
+class TextureUpload:
+    """
+    Image which is copied to a texture part by part
+    """
+
+    def __init__(
+            self,
+            image: np.ndarray,
+            on_ready: Callable[[int], None],
+    ):
+        """
+        Allocate the texture without pixels
+        :param image: RGBA image to copy to the texture
+        :param on_ready: Function to call with ID of the texture when the texture can be drawn
+        """
+        self.image = np.ascontiguousarray(image, np.uint8)
+        self.on_ready = on_ready
+        self.next_row = 0
+
+        self.texid = gl.glGenTextures(1)
+        GlState.bind_texture(self.texid)
+        gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_RGBA, image.shape[1], image.shape[0], 0,
+                        gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, None)
+
+    @property
+    def row_size(self) -> int:
+        """
+        :return: Size of one row of the image in bytes
+        """
+        return self.image.shape[1] * 4
+
+    @property
+    def finished(self) -> bool:
+        """
+        :return: True if all the rows were copied
+        """
+        return self.next_row == self.image.shape[0]
+
+
+class TextureUploader:
+    """
+    Upload images to textures without stalls of frames. Pixels are staged through pixel buffer objects, so
+    the driver copies them to textures in the background, and large images are spread over several frames
+    """
+
+    def __init__(
+            self,
+            bytes_per_frame: int = 512 * 1024,
+            buffers_count: int = 3,
+    ):
+        """
+        Create pixel buffer objects for staging
+        :param bytes_per_frame: Amount of pixels bytes to upload during one frame. At least one row of an image
+        is uploaded every frame
+        :param buffers_count: Amount of pixel buffer objects used in turn
+        """
+        self.bytes_per_frame = bytes_per_frame
+        self._queue: Deque[TextureUpload] = deque()
+        # Textures with all the pixels sent, waiting for the GPU to finish with them
+        self._fences: List[Tuple[object, TextureUpload]] = []
+
+        self._buffers = [int(buffer) for buffer in np.atleast_1d(gl.glGenBuffers(buffers_count))]
+        self._buffer_index = 0
+        for buffer in self._buffers:
+            GpuResources.add('buffer', buffer)
+            GpuResources.retain('buffer', buffer)
+
+    def __len__(self) -> int:
+        """
+        :return: Amount of textures which are not ready yet
+        """
+        return len(self._queue) + len(self._fences)
+
+    def upload(
+            self,
+            image: np.ndarray,
+            on_ready: Callable[[int], None],
+    ) -> None:
+        """
+        Start uploading of the image to a new texture. It is uploaded by the calls of process()
+        :param image: RGBA image to build texture
+        :param on_ready: Function to call with ID of the texture when the texture is ready to be drawn.
+        The function owns the texture like after Renderer.create_texture()
+        :return:
+        """
+        self._queue.append(TextureUpload(image, on_ready))
+        GlState.bind_texture(0)
+
+    def process(self) -> None:
+        """
+        Upload the next parts of images within the budget of one frame and report ready textures.
+        Call it once per frame from the OpenGL thread
+        :return:
+        """
+        self._check_fences()
+
+        budget = self.bytes_per_frame
+        while self._queue and budget > 0:
+            job = self._queue[0]
+            rows = min(max(budget // job.row_size, 1), job.image.shape[0] - job.next_row)
+            self._copy_rows(job, rows)
+            budget -= rows * job.row_size
+            if job.finished:
+                self._queue.popleft()
+                self._finish(job)
+
+        gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, 0)
+        GlState.bind_texture(0)
+
+    def _copy_rows(
+            self,
+            job: TextureUpload,
+            rows: int,
+    ) -> None:
+        """
+        Stage the next rows of the image in a pixel buffer and copy them to the texture from it
+        :param job: Image and its texture
+        :param rows: Amount of rows to copy
+        :return:
+        """
+        pixels = job.image[job.next_row:job.next_row + rows]
+        # Buffers are used in turn, so the driver can still read the previous ones
+        buffer = self._buffers[self._buffer_index]
+        self._buffer_index = (self._buffer_index + 1) % len(self._buffers)
+        gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, buffer)
+        gl.glBufferData(gl.GL_PIXEL_UNPACK_BUFFER, pixels.nbytes, pixels, gl.GL_STREAM_DRAW)
+        GpuResources.resize('buffer', buffer, pixels.nbytes)
+
+        GlState.bind_texture(job.texid)
+        gl.glTexSubImage2D(gl.GL_TEXTURE_2D, 0, 0, job.next_row, job.image.shape[1], rows,
+                           gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        job.next_row += rows
+
+    def _finish(
+            self,
+            job: TextureUpload,
+    ) -> None:
+        """
+        Generate mipmaps of the uploaded texture and wait for the GPU to finish it
+        :param job: Image and its texture
+        :return:
+        """
+        GlState.bind_texture(job.texid)
+        gl.glGenerateMipmap(gl.GL_TEXTURE_2D)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE)
+        gl.glTexParameterf(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST)
+        gl.glTexParameterf(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR_MIPMAP_LINEAR)
+        self._fences.append((gl.glFenceSync(gl.GL_SYNC_GPU_COMMANDS_COMPLETE, 0), job))
+
+    def _check_fences(self) -> None:
+        """
+        Report textures which the GPU has finished. Never waits for the GPU
+        :return:
+        """
+        pending = []
+        for fence, job in self._fences:
+            status = gl.glClientWaitSync(fence, 0, 0)
+            if status not in (gl.GL_ALREADY_SIGNALED, gl.GL_CONDITION_SATISFIED):
+                pending.append((fence, job))
+                continue
+            gl.glDeleteSync(fence)
+            # Mipmaps take a third more memory than the image
+            texid = GpuResources.add('texture', job.texid, job.image.nbytes * 4 // 3)
+            job.on_ready(texid)
+        self._fences = pending
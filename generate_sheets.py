@@ -0,0 +1,66 @@
+import argparse
+import os
+from typing import Sequence
+
+import cv2
+import numpy as np
+
+from engine.simplescanner import DEFAULT_SHEETS
+
+
+def draw_sheet(
+        marker_ids: Sequence[int],
+        width: int = 3200,
+) -> np.ndarray:
+    """
+    Draw an empty sheet with markers in the corners. Fish are drawn inside the frame between the markers
+    :param marker_ids: IDs of markers in the order: top left, top right, bottom right, bottom left
+    :param width: Width of the sheet between outer corners of markers in pixels. Height is 3/4 of it
+    like the target size of the scanner
+    :return: Grayscale image of the sheet with a white margin for printers
+    """
+    aruco_dict = cv2.aruco.Dictionary_get(cv2.aruco.DICT_4X4_50)
+    height = width * 3 // 4
+    margin = width // 20
+    # Scanner hides squares of the same part of the sheet to remove markers from the fish
+    marker_size = width // 6
+    sheet = np.full((height + 2 * margin, width + 2 * margin), 255, np.uint8)
+
+    positions = [(margin, margin),
+                 (margin + width - marker_size, margin),
+                 (margin + width - marker_size, margin + height - marker_size),
+                 (margin, margin + height - marker_size)]
+    for marker_id, (x, y) in zip(marker_ids, positions):
+        sheet[y:y + marker_size, x:x + marker_size] = cv2.aruco.drawMarker(aruco_dict, marker_id, marker_size)
+
+    # Light frame of the drawing area between the markers
+    gap = marker_size // 8
+    cv2.rectangle(sheet, (margin + marker_size + gap, margin + gap),
+                  (margin + width - marker_size - gap, margin + height - gap), 200, max(width // 800, 1))
+    # IDs in the margin to tell printed sheets apart
+    label = 'markers ' + ' '.join(str(marker_id) for marker_id in marker_ids)
+    cv2.putText(sheet, label, (margin, height + margin + margin * 2 // 3), cv2.FONT_HERSHEY_SIMPLEX,
+                width / 3200, 160, max(width // 1600, 1), cv2.LINE_AA)
+    return sheet
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Draw printable sheets with markers of the scanner')
+    parser.add_argument('--output', default='sheets', help='Folder to save images of the sheets')
+    parser.add_argument('--width', type=int, default=3200,
+                        help='Width of the sheets in pixels. 3200 pixels fill A4 landscape at 300 DPI')
+    parser.add_argument('--sheets', type=int, nargs='+', default=None,
+                        help='Indices of sheets in DEFAULT_SHEETS to draw. All the sheets are drawn by default')
+    args = parser.parse_args()
+
+    indices = args.sheets if args.sheets is not None else range(len(DEFAULT_SHEETS))
+    os.makedirs(args.output, exist_ok=True)
+    for index in indices:
+        marker_ids = DEFAULT_SHEETS[index]
+        filename = os.path.join(args.output, f'sheet_{index + 1:02d}_markers_{"_".join(map(str, marker_ids))}.png')
+        cv2.imwrite(filename, draw_sheet(marker_ids, args.width))
+        print(filename)
+
+
+if __name__ == '__main__':
+    main()
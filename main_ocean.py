@@ -1,291 +1,267 @@
+import time
+from contextlib import nullcontext
 from functools import partial
 from glob import glob
 from queue import Queue
 from threading import Thread
-from typing import List, Optional, Callable
+from typing import List, Optional, Callable, Tuple
 
 import OpenGL.GL as gl
 import OpenGL.GLUT as glut
 import cv2
 import numpy as np
 
-from engine.drawing import Drawing
+from engine.autoscanner import AutoScanner
+from engine.camera import CameraCapture
+from engine.drawinginstanced import INSTANCED_SHADER_CODE
+from engine.entityregistry import EntityRegistry
+from engine.fixedsteploop import FixedStepLoop
+from engine.frameprofiler import FrameProfiler
+from engine.gpuresources import GpuResources
+from engine.parallelscanner import ParallelScanner
 from engine.renderer import Renderer
-from engine.simplescanner import SimpleScanner
+from engine.scancache import ScanCache
+from engine.scene import Scene
+from engine.sceneloader import SceneLoader
+from engine.simplescanner import Cutout, SimpleScanner
+from ocean.drawingbubble import DrawingBubbles
 from ocean.drawingfish import DrawingFish, FISH_SHADER_CODE
 from ocean.drawingseaweed import DrawingSeaweed, SEAWEED_SHADER_CODE
 from ocean.drawingstatic import DrawingStatic
+from ocean.fishschool import FishSchool
 
 
-def create_back_layer(
-        filename: str,
-        z: float,
-        shader: int = 0,
-) -> DrawingStatic:
+def draw_ocean(entities: EntityRegistry) -> None:
     """
-    Create sprite for the scene background
-    :param filename: Path to the background image
-    :param z: Depth position of the sprite
-    :param shader: Shader ID for the background
-    :return: Sprite object for the background
-    """
-    drawing_back = DrawingStatic(Renderer.create_texture_from_file(filename), shader=shader)
-    drawing_back.position = np.array([0, 0., z])
-    drawing_back.scale = np.array([3.6, 2.0, 1.0])
-    return drawing_back
-
-
-def draw_sails(
-        drawings_list: List[Drawing],
-        shader: int,
-) -> None:
-    """
-    Support function to draw sails
-    :param drawings_list: List of sprites to draw
-    :param shader: Shader to animate the sails
-    :return:
-    """
-    drawing = DrawingSeaweed(Renderer.create_texture_from_file('ocean/images/sail_1.png'), shader=shader)
-    drawing.position = np.array([1.2, -0.43, -0.77])
-    drawing.scale = np.array([0.6, 0.4, 1.0])
-    drawings_list.append(drawing)
-
-    drawing = DrawingSeaweed(Renderer.create_texture_from_file('ocean/images/sail_2.png'), shader=shader)
-    drawing.position = np.array([1.6, -0.34, -0.77])
-    drawing.scale = np.array([0.3, 0.5, 1.0])
-    drawings_list.append(drawing)
-
-    drawing = DrawingSeaweed(Renderer.create_texture_from_file('ocean/images/sail_3.png'), shader=shader)
-    drawing.position = np.array([1.7, -0.71, -0.77])
-    drawing.scale = np.array([0.2, 0.3, 1.0])
-    drawings_list.append(drawing)
-
-
-def draw_ocean(drawings_list: List[Drawing]) -> None:
-    """
-    Draw all the sprites in the ocean scene
-    :param drawings_list: Lists of sprites to draw
+    Draw all the sprites in the ocean scene described in the scene file
+    :param entities: Registry to add sprites in it
     :return:
     """
-    seaweed_shader_program = Renderer.create_shader(gl.GL_VERTEX_SHADER, SEAWEED_SHADER_CODE)
-
-    drawings_list.append(create_back_layer('ocean/images/back_down.png', -0.8))
-    drawings_list.append(create_back_layer('ocean/images/back_middle.png', -0.78))
-    drawings_list.append(create_back_layer('ocean/images/back_reef.png', 0.8))
-
-    draw_sails(drawings_list, seaweed_shader_program)
-
-    seaweed_texture = Renderer.create_texture_from_file('ocean/images/seaweed_2.png')
-    # Draw seaweed under the ship
-    drawing = DrawingSeaweed(seaweed_texture, shader=seaweed_shader_program)
-    drawing.position = np.array([1.2, 0.4, -0.75])
-    drawing.scale = np.array([0.8, 0.4, 1.0])
-    drawings_list.append(drawing)
-
-    seaweed_texture = Renderer.create_texture_from_file('ocean/images/seaweed_1.png')
-    # Draw seaweed in the right corner
-    drawing = DrawingSeaweed(seaweed_texture, shader=seaweed_shader_program)
-    drawing.position = np.array([1.2, 1.0, 0.9])
-    drawing.scale = np.array([0.8, 1.4, 1.0])
-    # drawing.color = np.array([0.5, 0.5, 1.0])
-    drawings_list.append(drawing)
-
-    # Draw seaweed in the front of the rock
-    drawing = DrawingSeaweed(seaweed_texture, shader=seaweed_shader_program)
-    drawing.position = np.array([0.2, 0.15, -0.7])
-    drawing.scale = np.array([0.4, 0.4, 1.0])
-    # drawing.color = np.array([0.6, 0.6, 1.0])
-    drawings_list.append(drawing)
-
-    seaweed_texture = Renderer.create_texture_from_file('ocean/images/seaweed_3.png')
-    # Draw seaweed in the left corner
-    drawing = DrawingSeaweed(seaweed_texture, shader=seaweed_shader_program)
-    drawing.position = np.array([-1.2, 0.6, 0.9])
-    drawing.scale = np.array([0.3, 1.0, 1.0])
-    # drawing.color = np.array([0.5, 0.5, 1.0])
-    drawings_list.append(drawing)
-
-    # Draw seaweed on the background
-    drawing = DrawingSeaweed(seaweed_texture, shader=seaweed_shader_program)
-    drawing.position = np.array([-0.8, -0.5, -0.795])
-    drawing.scale = np.array([0.3, 1.0, 1.0])
-    drawing.color = np.array([0.3, 0.3, 0.8])
-    drawings_list.append(drawing)
-
-    drawing = DrawingSeaweed(seaweed_texture, shader=seaweed_shader_program)
-    drawing.position = np.array([0.0, -0.2, -0.795])
-    drawing.scale = np.array([-0.3, 1.0, 1.0])
-    drawing.color = np.array([0.3, 0.3, 0.8])
-    drawings_list.append(drawing)
-
-    drawing = DrawingSeaweed(seaweed_texture, shader=seaweed_shader_program)
-    drawing.position = np.array([-0.4, -0.2, -0.795])
-    drawing.scale = np.array([0.1, 0.3, 1.0])
-    drawing.color = np.array([0.1, 0.1, 0.4])
-    drawings_list.append(drawing)
+    loader = SceneLoader({'static': DrawingStatic, 'seaweed': DrawingSeaweed},
+                         {'seaweed': SEAWEED_SHADER_CODE})
+    loader.load('ocean/scene.json', entities)
 
 
 def scan_from_frame(
         frame: np.ndarray,
         scanner: SimpleScanner,
-) -> Optional[np.ndarray]:
+        profiler: Optional[FrameProfiler] = None,
+) -> List[Cutout]:
     """
-    Scan a fish from a frame
-    :param frame: BGR photo of the fish drawing
+    Scan all the fish from a frame
+    :param frame: BGR photo of the fish drawings
     :param scanner: Object of scanner to process photo
-    :return: Processed frame with a fish selected from the background
+    :param profiler: Profiler to measure scanning time. Select None to not measure it
+    :return: Processed frames with fish selected from the background
     """
-    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    try:
-        processed_frame = scanner.scan(frame)
-    except ValueError as e:
-        print(e)
-        return None
-    processed_frame = scanner.remove_background(processed_frame)
-    return processed_frame
+    with profiler.phase('scan') if profiler is not None else nullcontext():
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        processed_frames = scanner.scan_many(frame)
+        if len(processed_frames) == 0:
+            print('Markers in the image are not found')
+        return [scanner.trim(processed_frame) for processed_frame in processed_frames]
 
 
 def scan_fish(
         scanner: SimpleScanner,
         scanned_fish: Queue,
-        camera_id: int = 1,
+        camera: CameraCapture,
+        profiler: Optional[FrameProfiler] = None,
 ) -> None:
     """
-    Capture frame from input device with index 0 and scan fish from it
+    Take the latest frame from the camera and scan fish from it
     :param scanner: Object of scanner to process photo
     :param scanned_fish: Queue with scanned fish
-    :param camera_id: Id of the camera to capture a frame
+    :param camera: Running camera capture
+    :param profiler: Profiler to measure scanning time. Select None to not measure it
     :return:
     """
-    camera = cv2.VideoCapture(camera_id)
-    if not camera.isOpened():
-        raise EnvironmentError('Can not connect to the camera')
-    ret, frame = camera.read()
-    if ret is False:
-        raise IOError('Error reading frame from the camera')
-
-    processed_frame = scan_from_frame(frame, scanner)
-    camera.release()
-    if processed_frame is not None:
+    frame = camera.get_frame()
+    for processed_frame in scan_from_frame(frame, scanner, profiler):
         scanned_fish.put(processed_frame)
 
 
 def load_fish_from_files(
         scanner: SimpleScanner,
-        drawings_list: List[Drawing],
-        fish_queue: Queue,
+        entities: EntityRegistry,
+        school: FishSchool,
         fish_shader_program: int = 0,
-        bubble_texture: int = 0,
+        processes: Optional[int] = None,
+        cache: Optional[ScanCache] = None,
 ) -> None:
     """
     Load all the predrawing fish from the folder
     :param scanner: Object of scanner to process photos
-    :param drawings_list: Lists of sprites to add fish in it
-    :param fish_queue: Queue to maintain order of fish
+    :param entities: Registry to add fish in it
+    :param school: School to move the fish with
     :param fish_shader_program: ID of fish shader
-    :param bubble_texture: ID of bubble texture
+    :param processes: Amount of processes to scan photos. Select None to use all the CPUs
+    :param cache: Cache of already scanned photos
     :return:
     """
-    files = glob('./photos/*.jpg')
-    for filename in files:
-        frame = cv2.imread(filename)
-        if frame is None:
-            raise ValueError(f'Error reading image with filename: {filename}')
-        scanned_fish = scan_from_frame(frame, scanner)
-        drawing = DrawingFish(Renderer.create_texture(scanned_fish),
-                              shader=fish_shader_program,
-                              bubble_texture_id=bubble_texture)
-        drawings_list.append(drawing)
-        fish_queue.put(drawing)
+    files = sorted(glob('./photos/*.jpg'))
+    # Photos are scanned in worker processes, only textures are created here in the OpenGL thread
+    for scanned_fish_list in ParallelScanner(scanner, processes, cache).scan_files(files):
+        for scanned_fish in scanned_fish_list:
+            drawing = DrawingFish(Renderer.create_texture(scanned_fish.image), school,
+                                  shader=fish_shader_program,
+                                  cutout_rect=scanned_fish.relative_rect())
+            entities.add(drawing, 'fish', evictable=True)
 
 
 def create_key_processor(
         scanner: SimpleScanner,
         scanned_fish_queue: Queue,
+        camera: Optional[CameraCapture],
+        auto_scanner: Optional[AutoScanner] = None,
+        renderer: Optional[Renderer] = None,
+        school: Optional[FishSchool] = None,
 ) -> Callable:
     """
     Wrapper for keys processor function
     :param scanner: Object of scanner to process photos
     :param scanned_fish_queue: Queue with scanning results
+    :param camera: Running camera capture or None if there is no camera
+    :param auto_scanner: Trigger of automatic scanning or None if it is not used
+    :param renderer: Object of the Engine to show its profiler
+    :param school: School of the fish to toggle schooling
     :return: Function in the format for the GLUT
     """
+    profiler = renderer.profiler if renderer is not None else None
+
     def keys_processor(key, x, y):
         if key == b'\x1b':  # esc
             exit(0)
         if key == b'\r':  # enter
-            thread = Thread(target=scan_fish, args=(scanner, scanned_fish_queue))
+            if camera is None:
+                print('Camera is not connected')
+                return
+            thread = Thread(target=scan_fish, args=(scanner, scanned_fish_queue, camera, profiler))
             thread.start()
+        if key == b'm':
+            for kind, stats in GpuResources.stats().items():
+                print(f'{kind}: {stats["objects"]} objects, {stats["bytes"]} bytes')
+        if key == b'a' and auto_scanner is not None:
+            auto_scanner.enabled = not auto_scanner.enabled
+            print(f'Automatic scanning is {"enabled" if auto_scanner.enabled else "disabled"}')
+        if key == b's' and school is not None:
+            school.schooling = not school.schooling
+            print(f'Schooling is {"enabled" if school.schooling else "disabled"}')
+        if key == b'p' and renderer is not None:
+            renderer.hud.visible = not renderer.hud.visible
+        if key == b't' and renderer is not None:
+            if renderer.profiler.tracing:
+                filename = time.strftime('trace-%Y%m%d-%H%M%S.json')
+                renderer.profiler.save_trace(filename)
+                print(f'Trace is saved to {filename}')
+            else:
+                renderer.profiler.start_trace()
+                print('Trace is recording. Press T again to save it')
+        if renderer is not None:
+            # Profiler measures nothing while nobody looks at the results
+            renderer.profiler.enabled = renderer.hud.visible or renderer.profiler.tracing
     return keys_processor
 
 
 def create_animation_function(
         renderer: Renderer,
-        drawings_list: List[Drawing],
+        entities: EntityRegistry,
         scanned_fish_queue: Queue,
-        fish_queue: Queue,
         fish_limit: int,
-        timer_msec: int,
+        school: FishSchool,
         fish_shader_program: int = 0,
-        bubble_texture: int = 0,
 ) -> Callable:
     """
-    Wrapper for animation function
+    Wrapper for function called after every step of animation
     :param renderer: Object of the Engine to draw all the objects
-    :param drawings_list: Lists of sprites to draw
+    :param entities: Registry of sprites to draw
     :param scanned_fish_queue: Queue with scanning results
-    :param fish_queue: Queue to maintain order of fish
-    :param fish_limit: Maximum amount of fish to draw
-    :param timer_msec: Timer interval value for animation
+    :param fish_limit: Maximum amount of fish to draw. The oldest fish swim away
+    :param school: School to move the fish with
     :param fish_shader_program: ID of fish shader
-    :param bubble_texture: ID of bubble texture
-    :return: Function in the format for the GLUT
+    :return: Function in the format for the FixedStepLoop
     """
-    def animate(value):
-        renderer.animate(drawings_list)
-        glut.glutTimerFunc(timer_msec, animate, 0)
+    def add_fish(
+            texid: int,
+            cutout_rect: Tuple[float, float, float, float],
+    ) -> None:
+        drawing = DrawingFish(texid, school,
+                              shader=fish_shader_program,
+                              cutout_rect=cutout_rect)
+        entities.add(drawing, 'fish', evictable=True)
 
-        # Get fish scan from scanner thread
+    def animate():
+        # Get fish scan from scanner thread. The fish appears when its texture is uploaded
         if scanned_fish_queue.qsize() > 0:
             scanned_fish = scanned_fish_queue.get()
-            drawing = DrawingFish(Renderer.create_texture(scanned_fish),
-                                  shader=fish_shader_program,
-                                  bubble_texture_id=bubble_texture)
-            drawings_list.append(drawing)
-            fish_queue.put(drawing)
+            renderer.uploader.upload(scanned_fish.image,
+                                     partial(add_fish, cutout_rect=scanned_fish.relative_rect()))
 
-        if fish_queue.qsize() > fish_limit:
-            fish = fish_queue.get()
-            fish.go_away()
+        if entities.eviction_queue_size > fish_limit:
+            entities.evict().go_away()
 
-        # Remove dead fish from drawing list
-        for drawing in drawings_list:
-            if isinstance(drawing, DrawingFish) and not drawing.is_alive:
-                drawings_list.remove(drawing)
+        with renderer.profiler.phase('scene'):
+            # Remove fish which left the screen and free their textures
+            for drawing in school.pop_gone():
+                entities.remove(entities.handle(drawing))
     return animate
 
 
 def main():
     scanner = SimpleScanner()
+    # Upload only the part of the sheet with the fish
+    scanner.crop_to_content = True
+    scanner.max_texture_size = 512
+
+    # Keep the camera open all the time, so scanning doesn't wait for the device
+    camera = CameraCapture(camera_id=1)
+    try:
+        camera.start()
+    except EnvironmentError as e:
+        print(e)
+        camera = None
+
+    # Scan sheets automatically when they are still under the camera. Press A to toggle
+    auto_scan = True
+    auto_scanner = None
 
     gl.glClearColor(0.1, 0.1, 0.2, 1.0)
-    timer_msec = int(1000 / 60) # 60 times per second
+    # Linked shaders are kept on disk, so the next start doesn't compile them
+    Renderer.shader_cache_directory = './cache/shaders'
     renderer = Renderer()
-    drawings_list = []
-    fish_queue = Queue() # Queue to maintain order of the fish and kill the oldest ones
-    fish_limit = 10 # Maximum amount of fish to draw
+    entities = EntityRegistry(Scene())
+    fish_limit = 10 # Maximum amount of fish to draw, the oldest ones swim away
     scanned_fish_queue = Queue()
-    draw_ocean(drawings_list)
+    draw_ocean(entities)
 
     fish_shader_program = Renderer.create_shader(gl.GL_VERTEX_SHADER, FISH_SHADER_CODE)
+    # All the bubbles are drawn with one draw call
     bubble_texture = Renderer.create_texture_from_file('ocean/images/bubble.png')
-    load_fish_from_files(scanner, drawings_list, fish_queue, fish_shader_program, bubble_texture)
-
-    glut.glutDisplayFunc(partial(renderer.render, drawings_list))
+    bubble_shader_program = Renderer.create_shader(gl.GL_VERTEX_SHADER, INSTANCED_SHADER_CODE)
+    bubbles = DrawingBubbles(bubble_texture, bubble_shader_program)
+    entities.add(bubbles, 'bubbles')
+    # Fish are moved all together after the other sprites
+    school = FishSchool(bubbles)
+    entities.scene.add_system(school.animation)
+    scan_cache = ScanCache('./cache', scanner.settings())
+    load_fish_from_files(scanner, entities, school, fish_shader_program,
+                         cache=scan_cache)
+
+    if camera is not None and auto_scan:
+        auto_scanner = AutoScanner(camera, partial(scan_from_frame, scanner=scanner, profiler=renderer.profiler),
+                                   scanned_fish_queue.put)
+        auto_scanner.start()
+
+    # Animation runs 60 steps per second. Frames are limited to the usual refresh rate of displays, so the loop
+    # doesn't take a whole CPU core when buffers are swapped without waiting for the display
+    loop = FixedStepLoop(renderer, entities.scene,
+                         create_animation_function(renderer, entities, scanned_fish_queue, fish_limit, school,
+                                                   fish_shader_program),
+                         step=1 / 60, max_fps=60)
+    loop.start()
     glut.glutIgnoreKeyRepeat(True)
-    glut.glutKeyboardFunc(create_key_processor(scanner, scanned_fish_queue))
-    glut.glutTimerFunc(timer_msec, create_animation_function(renderer, drawings_list, scanned_fish_queue,
-                                                             fish_queue, fish_limit, timer_msec,
-                                                             fish_shader_program, bubble_texture), 0)
+    glut.glutKeyboardFunc(create_key_processor(scanner, scanned_fish_queue, camera, auto_scanner, renderer,
+                                                  school))
 
     glut.glutMainLoop()
 
@@ -1,43 +1,91 @@
-import math
+from typing import Union
 
 import numpy as np
 
-from engine.drawing import Drawing
+from engine.drawinginstanced import DrawingInstanced
+from engine.particlesystem import ParticleSystem
 
 
-class DrawingBubble(Drawing):
+class DrawingBubbles(DrawingInstanced):
     """
-    Sprite for drawing of bubble
+    Sprite for drawing of all the bubbles with the same texture at once. Bubbles are moved all together
     """
 
     def __init__(
             self,
             texid: int,
-            start_x: float = 0.,
-            start_y: float = 0.,
+            shader: int,
     ):
         """
-        Set starting position for the bubble
+        Create empty set of bubbles
         :param texid: ID of texture
-        :param start_x: Start X position of the bubble
-        :param start_y: Start Y position of the bubble
+        :param shader: ID of shader compiled from INSTANCED_SHADER_CODE
         """
-        super(DrawingBubble, self).__init__(texid, 1, 1, shader=0)
+        super(DrawingBubbles, self).__init__(texid, shader)
+        # Bubbles are drawn over the fish at the same depth
+        self.position = np.array([0., 0., 0.001])
+        self._bubbles = ParticleSystem({
+            'position': (2,),
+            'previous_position': (2,),
+            'start_x': (),
+            'speed_y': (),
+            'frequency_x': (),
+            'deviation_x': (),
+            'size': (),
+        })
 
-        bubble_size = np.random.uniform(0.01, 0.15)
-        self.scale = np.array([bubble_size, bubble_size, 1.0])
-        self.position = np.array([start_x, start_y, 0.])
-        self._start_x = start_x
-        self._start_y = start_y
+    def __len__(self) -> int:
+        """
+        :return: Amount of bubbles
+        """
+        return len(self._bubbles)
 
-        self.speed_y = -0.005
-        self.frequency_x = 10
-        self.deviation_x = 0.1
+    def emit(
+            self,
+            start_x: Union[float, np.ndarray],
+            start_y: Union[float, np.ndarray],
+            speed_y: Union[float, np.ndarray] = -0.005,
+            deviation_x: Union[float, np.ndarray] = 0.1,
+            frequency_x: Union[float, np.ndarray] = 10.0,
+    ) -> None:
+        """
+        Add new bubbles of random sizes. Every parameter is a value or an array with a value for every bubble
+        :param start_x: Start X position of bubbles
+        :param start_y: Start Y position of bubbles
+        :param speed_y: Speed of bubbles rising
+        :param deviation_x: Amplitude of bubbles swaying
+        :param frequency_x: Frequency of bubbles swaying along the way up
+        :return:
+        """
+        start_x, start_y = np.broadcast_arrays(np.atleast_1d(start_x), start_y)
+        count = len(start_x)
+        position = np.stack([start_x, start_y], axis=1)
+        self._bubbles.add(count,
+                          position=position,
+                          previous_position=position,
+                          start_x=start_x,
+                          speed_y=speed_y,
+                          frequency_x=frequency_x,
+                          deviation_x=deviation_x,
+                          size=np.random.uniform(0.01, 0.15, count))
 
     def animation(self) -> None:
         """
-        Logic of movement of the bubble
+        Move all the bubbles and delete bubbles when they left the screen
         :return:
         """
-        self.position[0] = self._start_x + self.deviation_x * math.sin(self.position[1] * self.frequency_x)
-        self.position[1] += self.speed_y
+        bubbles = self._bubbles
+        position = bubbles['position']
+        # Previous positions are moved together with the bubbles when bubbles are deleted
+        bubbles['previous_position'][:] = position
+        position[:, 0] = bubbles['start_x'] + bubbles['deviation_x'] * np.sin(position[:, 1] * bubbles['frequency_x'])
+        position[:, 1] += bubbles['speed_y']
+        bubbles.remove(position[:, 1] < -1)
+
+        instances = np.zeros((len(bubbles), 4), np.float32)
+        instances[:, 3] = bubbles['size']
+        previous_instances = instances.copy()
+        instances[:, :2] = bubbles['position']
+        previous_instances[:, :2] = bubbles['previous_position']
+        self.instances = instances
+        self.previous_instances = previous_instances
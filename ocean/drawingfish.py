@@ -1,12 +1,13 @@
-from typing import List
+from typing import Tuple
 
 import numpy as np
 
 from engine.drawing import Drawing
-from ocean.drawingbubble import DrawingBubble
+from ocean.fishschool import FishSchool
 
 FISH_SHADER_CODE = """
-uniform float timer;
+attribute mat4 model;
+attribute vec4 sprite;
 vec4 sine_wave(vec4 p) {
     float pi = 3.14159;
     float A_x = 0.001;
@@ -18,138 +19,49 @@ vec4 sine_wave(vec4 p) {
     return vec4(p.x+x, p.y+y, p.z, p.w);
 }
 void main() {
-    gl_Position = sine_wave(gl_ModelViewProjectionMatrix * gl_Vertex);
-    gl_FrontColor = gl_Color;
-    gl_TexCoord[0].xy = gl_MultiTexCoord0.xy;
+    gl_Position = sine_wave(gl_ModelViewProjectionMatrix * model * gl_Vertex);
+    gl_FrontColor = vec4(sprite.rgb, 1.0);
+    gl_TexCoord[0] = gl_MultiTexCoord0;
 }
 """
 
 
 class DrawingFish(Drawing):
     """
-    Sprite for drawing of fish
+    Sprite for drawing of fish. Fish are moved by their school
     """
 
     def __init__(
             self,
             texid: int,
+            school: FishSchool,
             grid_x: int = 5,
             grid_y: int = 5,
             shader: int = 0,
-            bubble_texture_id: int = 0,
+            cutout_rect: Tuple[float, float, float, float] = (0., 0., 1., 1.),
     ):
         """
-        Set default position of fish and select default vector of moving
+        Add the fish to the school which selects its position and vector of moving
         :param texid: ID of texture
+        :param school: School to move the fish with
         :param grid_x: Mesh elements along axis X
         :param grid_y: Mesh elements along axis Y
         :param shader: ID of shader. Select 0 if you need no shader
-        :param bubble_texture_id: ID of a bubble texture
+        :param cutout_rect: Position of the texture on the scanned sheet as parts of the sheet size
         """
         super(DrawingFish, self).__init__(texid, grid_x, grid_y, shader)
 
-        self.scale = np.array([0.4, 0.3, 0.3])
-        self.vector = np.array([0, 0.02, 0.0])
+        # The whole sheet is 0.4 x 0.3, a cropped fish keeps the same proportions
+        _, _, cutout_w, cutout_h = cutout_rect
+        self.scale = np.array([0.4 * cutout_w, 0.3 * cutout_h, 0.3])
         self.is_alive = True # The fish will be deleted from the drawing list when it False
 
-        self._left = -1.5
-        self._right = 1.5
-        self._top = -0.7
-        self._bottom = 0.3
-        self.position = np.array([np.random.uniform(self._left, self._right), -1, 0.])
-        if np.random.randint(2) == 0:
-            self.scale[0] = -self.scale[0]
-
-        # Parameters for animations
-        self._animation_stage = 'init'
-        self._init_animation_step = 120
-        self._water_resistance = np.random.uniform(0.95, 0.98)
-
-        # To animate bubbles
-        self._bubble_texture_id = bubble_texture_id
-        self._bubble_random_frequency = 2
-        self._bubble_deviation_x = 0
-        self._bubble_speed_y = -0.01
-        self._bubbles = []
-
-    def _init_fish_velocity(self) -> None:
-        """
-        Setup initial values for velocity vector
-        :return:
-        """
-        self.vector = np.array([np.random.uniform(0.002, 0.003),
-                                np.random.uniform(0.001, 0.002), 0.0])
-        if self.scale[0] < 0:
-            self.vector[0] = -self.vector[0]
-        if np.random.randint(2) == 0:
-            self.vector[1] = -self.vector[1]
-
-        self._bubble_random_frequency = 500
-        self._bubble_deviation_x = 0.1
-        self._bubble_speed_y = -0.005
-
-    def _process_bubbles(self) -> None:
-        # randomly create bubble
-        if np.random.randint(int(self._bubble_random_frequency)) == 0:
-            bubble_x = np.random.uniform(self.position[0], self.position[0] + self.scale[0]/2)
-            bubble = DrawingBubble(self._bubble_texture_id,
-                                   start_x=bubble_x, start_y=self.position[1])
-            bubble.deviation_x = self._bubble_deviation_x
-            bubble.speed_y = self._bubble_speed_y
-            self._bubbles.append(bubble)
-
-        # delete bubbles when they left the screen
-        for bubble in self._bubbles:
-            if bubble.position[1] < -1:
-                self._bubbles.remove(bubble)
-
-    def animation(self) -> None:
-        """
-        Logic of movement of the fish
-        :return:
-        """
-        self.position += self.vector
-        self._process_bubbles()
-
-        if self._animation_stage == 'init':
-            self._init_animation_step -= 1
-            self._bubble_random_frequency += 0.1
-            self.vector[1] *= self._water_resistance
-            # Finis init animation
-            if self._init_animation_step == 0:
-                self._init_fish_velocity()
-                self._animation_stage = 'swim'
-
-        elif self._animation_stage == 'swim':
-            # If we near border go to the other direction
-            if self.position[0] > self._right or self.position[0] < self._left:
-                self.vector[0] = -self.vector[0]
-                self.rotation_vector[1] = 5.0
-
-            if self.position[1] < self._top or self.position[1] > self._bottom:
-                self.vector[1] = -self.vector[1]
-
-            self.rotate[1] = (self.rotate[1] + self.rotation_vector[1]) % 360
-
-            if self.rotate[1] % 180 == 0:
-                self.rotation_vector[1] = 0.0
-
-        elif self._animation_stage == 'finish':
-            if self.position[0] > self._right + 1.0 or self.position[0] < self._left - 1.0:
-                self.is_alive = False
-
-    def get_child_sprites(self) -> List[Drawing]:
-        """
-        Return list of bubbles
-        :return: List of bubbles
-        """
-        return self._bubbles
+        self._school = school
+        school.add(self)
 
     def go_away(self) -> None:
         """
         Start animation of fish swimming away
         :return:
         """
-        self.vector[1] = 0.0
-        self.vector[0] *= 2
-        self._animation_stage = 'finish'
+        self._school.go_away(self)
@@ -1,8 +1,9 @@
 from engine.drawing import Drawing
 
 SEAWEED_SHADER_CODE = """
-uniform float timer;
-vec4 sine_wave(vec4 p) {
+attribute mat4 model;
+attribute vec4 sprite;
+vec4 sine_wave(vec4 p, float timer) {
     float pi = 3.14159;
     float A_x = 0.02;
     float A_y = 0.02;
@@ -13,9 +14,9 @@ vec4 sine_wave(vec4 p) {
     return vec4(p.x+x, p.y+y, p.z, p.w);
 }
 void main() {
-    gl_Position = gl_ModelViewProjectionMatrix * sine_wave(gl_Vertex);
-    gl_FrontColor = gl_Color;
-    gl_TexCoord[0].xy = gl_MultiTexCoord0.xy;
+    gl_Position = gl_ModelViewProjectionMatrix * model * sine_wave(gl_Vertex, sprite.w);
+    gl_FrontColor = vec4(sprite.rgb, 1.0);
+    gl_TexCoord[0] = gl_MultiTexCoord0;
 }
 """
 
@@ -0,0 +1,302 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from engine.drawing import Drawing
+from engine.particlesystem import ParticleSystem
+from engine.spatialhash import SpatialHash
+from ocean.drawingbubble import DrawingBubbles
+
+# Stages of animation of fish
+STAGE_INIT = 0
+STAGE_SWIM = 1
+STAGE_FINISH = 2
+
+
+class FishSchool:
+    """
+    Movement of all the fish at once. Sprites of fish keep views of their rows in the arrays of the school,
+    so they are drawn as usual sprites
+    """
+
+    def __init__(
+            self,
+            bubbles: Optional[DrawingBubbles] = None,
+    ):
+        """
+        Create empty school
+        :param bubbles: Sprite to draw bubbles of the fish. Select None if the fish have no bubbles
+        """
+        self._bubbles = bubbles
+        self._left = -1.5
+        self._right = 1.5
+        self._top = -0.7
+        self._bottom = 0.3
+
+        # Fish swim in schools: keep distance, swim the same way and stay together. Select False to let
+        # fish swim independently
+        self.schooling = False
+        self.separation_distance = 0.08
+        self.separation_weight = 0.02
+        self.alignment_weight = 0.05
+        self.cohesion_weight = 0.002
+        # Limits of horizontal and vertical speed of fish in schools
+        self.min_speed = 0.002
+        self.max_speed = 0.004
+        self.max_speed_y = 0.0015
+        self.max_force = 0.0002
+        # Fish see neighbours in the cells around them
+        self._grid = SpatialHash(0.25)
+        self._separation_grid = SpatialHash(self.separation_distance)
+
+        self._fish = ParticleSystem({
+            'position': (3,),
+            'rotate': (3,),
+            'scale': (3,),
+            'vector': (3,),
+            'rotation_vector': (3,),
+            'stage': (),
+            'init_step': (),
+            'water_resistance': (),
+            'bubble_frequency': (),
+            'bubble_deviation_x': (),
+            'bubble_speed_y': (),
+        })
+        # Sprites by rows of the arrays and back
+        self._drawings: List[Drawing] = []
+        self._rows: Dict[Drawing, int] = {}
+        # Fish which left the screen since the last call of pop_gone()
+        self._gone: List[Drawing] = []
+
+    def __len__(self) -> int:
+        """
+        :return: Amount of fish
+        """
+        return len(self._fish)
+
+    def add(
+            self,
+            drawing: Drawing,
+    ) -> None:
+        """
+        Start animation of the fish from the bottom of the screen at a random place
+        :param drawing: Sprite of the fish. Its scale is the size of the fish
+        :return:
+        """
+        scale = np.array(drawing.scale, np.float64)
+        if np.random.randint(2) == 0:
+            scale[0] = -scale[0]
+        capacity = self._fish.capacity
+        row, = self._fish.add(position=[np.random.uniform(self._left, self._right), -1, 0.],
+                              rotate=drawing.rotate,
+                              scale=scale,
+                              vector=[0, 0.02, 0.0],
+                              stage=STAGE_INIT,
+                              init_step=120,
+                              water_resistance=np.random.uniform(0.95, 0.98),
+                              bubble_frequency=2,
+                              bubble_deviation_x=0,
+                              bubble_speed_y=-0.01)
+        self._drawings.append(drawing)
+        self._rows[drawing] = row
+        if self._fish.capacity != capacity:
+            # Arrays were allocated again, views of all the sprites are outdated
+            for moved_row, moved_drawing in enumerate(self._drawings):
+                self._bind(moved_drawing, moved_row)
+        else:
+            self._bind(drawing, row)
+
+    def go_away(
+            self,
+            drawing: Drawing,
+    ) -> None:
+        """
+        Start animation of the fish swimming away
+        :param drawing: Sprite of the fish
+        :return:
+        """
+        row = self._rows[drawing]
+        if self._fish['stage'][row] == STAGE_INIT:
+            # Rising fish don't move horizontally yet
+            self._init_fish_velocity(np.arange(len(self._fish)) == row)
+        vector = self._fish['vector']
+        # Fish swim away the way they swim now, at least twice as fast as the slowest fish
+        direction = np.sign(vector[row, 0]) or np.sign(self._fish['scale'][row, 0])
+        vector[row, 0] = direction * max(2 * abs(vector[row, 0]), 2 * self.min_speed)
+        vector[row, 1] = 0.0
+        self._fish['stage'][row] = STAGE_FINISH
+
+    def pop_gone(self) -> List[Drawing]:
+        """
+        Take the fish which finished animation and left the screen
+        :return: Sprites of the fish which are not alive anymore
+        """
+        gone = self._gone
+        self._gone = []
+        return gone
+
+    def animation(self) -> None:
+        """
+        Logic of movement of all the fish
+        :return:
+        """
+        if len(self._fish) == 0:
+            return
+        fish = self._fish
+        position = fish['position']
+        vector = fish['vector']
+        rotate = fish['rotate']
+        rotation_vector = fish['rotation_vector']
+        stage = fish['stage']
+        init = stage == STAGE_INIT
+        swim = stage == STAGE_SWIM
+        finish = stage == STAGE_FINISH
+
+        position += vector
+        self._emit_bubbles()
+
+        # Fish rise from the bottom and slow down
+        fish['init_step'][init] -= 1
+        fish['bubble_frequency'][init] += 0.1
+        vector[init, 1] *= fish['water_resistance'][init]
+        started = init & (fish['init_step'] == 0)
+        if started.any():
+            self._init_fish_velocity(started)
+
+        if self.schooling and np.count_nonzero(swim) > 1:
+            self._steer(np.flatnonzero(swim))
+
+        # If fish are near border they go to the other direction
+        x, y = position[:, 0], position[:, 1]
+        vector[swim & (x > self._right), 0] = -np.abs(vector[swim & (x > self._right), 0])
+        vector[swim & (x < self._left), 0] = np.abs(vector[swim & (x < self._left), 0])
+        vector[swim & (y > self._bottom), 1] = -np.abs(vector[swim & (y > self._bottom), 1])
+        vector[swim & (y < self._top), 1] = np.abs(vector[swim & (y < self._top), 1])
+
+        # Fish which look the wrong way turn around axis Y. Leaving fish finish their turns too
+        facing = np.where(np.sign(vector[:, 0]) == np.sign(fish['scale'][:, 0]), 0.0, 180.0)
+        turn = (rotate[:, 1] % 180 != 0) | (rotate[:, 1] != facing)
+        moving = swim | finish
+        rotation_vector[moving, 1] = np.where(turn[moving], 5.0, 0.0)
+        rotate[moving, 1] = (rotate[moving, 1] + rotation_vector[moving, 1]) % 360
+
+        gone = finish & ((x > self._right + 1.0) | (x < self._left - 1.0))
+        if gone.any():
+            self._remove(gone)
+
+    def _steer(
+            self,
+            rows: np.ndarray,
+    ) -> None:
+        """
+        Change velocities of fish by their neighbours: move away from too close ones, align with the velocity
+        of neighbours and move to their center
+        :param rows: Fish to steer
+        :return:
+        """
+        position = self._fish['position'][rows, :2]
+        velocity = self._fish['vector'][rows, :2]
+        values = np.hstack([np.ones((len(rows), 1)), position, velocity])
+
+        # Sums over neighbours without the fish itself
+        self._grid.build(position)
+        sums = self._grid.neighbour_sums(values) - values
+        alone = sums[:, :1] == 0
+        neighbours = np.maximum(sums[:, :1], 1)
+        cohesion = np.where(alone, 0.0, sums[:, 1:3] / neighbours - position)
+        alignment = np.where(alone, 0.0, sums[:, 3:5] / neighbours - velocity)
+
+        self._separation_grid.build(position)
+        close = self._separation_grid.neighbour_sums(values[:, :3]) - values[:, :3]
+        separation = position - close[:, 1:3] / np.maximum(close[:, :1], 1)
+        separation[close[:, 0] == 0] = 0.0
+
+        steer = (self.cohesion_weight * cohesion + self.alignment_weight * alignment
+                 + self.separation_weight * separation)
+        # Fish can't turn sharply
+        force = np.linalg.norm(steer, axis=1)
+        steer *= (np.minimum(force, self.max_force) / np.maximum(force, 1e-9))[:, None]
+        velocity += steer
+        # Fish swim mostly horizontally like the ones without school and never stop. Horizontal speed
+        # doesn't go through zero, so fish turn back only at the borders
+        np.clip(velocity[:, 1], -self.max_speed_y, self.max_speed_y, out=velocity[:, 1])
+        direction = np.where(velocity[:, 0] < 0, -1.0, 1.0)
+        velocity[:, 0] = direction * np.clip(np.abs(velocity[:, 0]), self.min_speed, self.max_speed)
+        self._fish['vector'][rows, :2] = velocity
+
+    def _init_fish_velocity(
+            self,
+            mask: np.ndarray,
+    ) -> None:
+        """
+        Setup initial values for velocity vectors of fish which finished init animation
+        :param mask: Fish to setup
+        :return:
+        """
+        fish = self._fish
+        count = np.count_nonzero(mask)
+        vector = np.zeros((count, 3))
+        vector[:, 0] = np.random.uniform(0.002, 0.003, count) * np.sign(fish['scale'][mask, 0])
+        vector[:, 1] = np.random.uniform(0.001, 0.002, count) * np.random.choice([-1, 1], count)
+        fish['vector'][mask] = vector
+        fish['stage'][mask] = STAGE_SWIM
+        fish['bubble_frequency'][mask] = 500
+        fish['bubble_deviation_x'][mask] = 0.1
+        fish['bubble_speed_y'][mask] = -0.005
+
+    def _emit_bubbles(self) -> None:
+        """
+        Randomly create bubbles near fish
+        :return:
+        """
+        if self._bubbles is None:
+            return
+        fish = self._fish
+        emit = np.random.randint(fish['bubble_frequency'].astype(int)) == 0
+        if not emit.any():
+            return
+        position = fish['position'][emit]
+        half_width = fish['scale'][emit, 0] / 2
+        self._bubbles.emit(position[:, 0] + np.random.uniform(0, 1, len(position)) * half_width,
+                           position[:, 1],
+                           fish['bubble_speed_y'][emit],
+                           fish['bubble_deviation_x'][emit])
+
+    def _remove(
+            self,
+            mask: np.ndarray,
+    ) -> None:
+        """
+        Stop animation of fish. Their sprites get own copies of the arrays and are marked as not alive
+        :param mask: Fish to remove
+        :return:
+        """
+        for row in np.flatnonzero(mask):
+            drawing = self._drawings[row]
+            for name in ('position', 'rotate', 'scale', 'vector', 'rotation_vector'):
+                setattr(drawing, name, getattr(drawing, name).copy())
+            drawing.is_alive = False
+            del self._rows[drawing]
+            self._gone.append(drawing)
+
+        moved_from, moved_to = self._fish.remove(mask)
+        for old_row, new_row in zip(moved_from, moved_to):
+            drawing = self._drawings[old_row]
+            self._drawings[new_row] = drawing
+            self._rows[drawing] = new_row
+            self._bind(drawing, new_row)
+        del self._drawings[len(self._fish):]
+
+    def _bind(
+            self,
+            drawing: Drawing,
+            row: int,
+    ) -> None:
+        """
+        Make the sprite use the row of the arrays for its position, rotation and scale
+        :param drawing: Sprite of the fish
+        :param row: Row of the fish
+        :return:
+        """
+        for name in ('position', 'rotate', 'scale', 'vector', 'rotation_vector'):
+            setattr(drawing, name, self._fish[name][row])